@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Response
 from supabase_client import supabase
 from datetime import datetime
+from typing import Annotated, Optional
+from utils import weak_etag, conditional_response, lists_version
 from collections import defaultdict
 from .models import AlertCard, ListWithItems
 
@@ -10,6 +12,8 @@ router = APIRouter()
 @router.get("/alerts_tab")
 def get_alerts(
     token: str = Header(...),
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    response: Response = None,
 ):
     """
     Return ALL alerts for the logged-in user, newest first,
@@ -22,6 +26,22 @@ def get_alerts(
             raise HTTPException(status_code=401, detail="Invalid token")
         user_id = user.user.id
 
+        # Cards change when an alert is added, re-triggered or removed, or when
+        # a list/item name they show is edited (which bumps lists.last_update)
+        latest = (
+            supabase.table("alerts")
+            .select("alert_id, last_triggered", count="exact")
+            .eq("user_id", user_id)
+            .order("last_triggered", desc=True)
+            .order("alert_id", desc=True)
+            .limit(1)
+            .execute()
+        )
+        etag = weak_etag(latest.count, latest.data, lists_version(user_id))
+        not_modified = conditional_response(response, if_none_match, etag)
+        if not_modified:
+            return not_modified
+
         alerts = (
             supabase.table("alerts")
             .select("alert_id, store_id, alert_type, last_triggered")
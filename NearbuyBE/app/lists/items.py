@@ -3,6 +3,7 @@ from supabase_client import supabase
 from datetime import datetime
 from pydantic import BaseModel
 from utils import *
+from notifications.deadline_scheduler import deadline_scheduler
 from lists.models import (
     RenameItemRequest,
     CheckItemRequest,
@@ -158,6 +159,7 @@ def update_item_deadline(
         if not res.data:
             raise HTTPException(404, "Item not found or not authorised")
 
+        deadline_scheduler.schedule_item(item_id, req.deadline)
         bump_list_timestamp(req.list_id)
         return {"message": "Deadline updated"}
 
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, HTTPException, Header, Path
+from fastapi import APIRouter, HTTPException, Header, Path, Response
 from lists.models import UserList, ListItem, CreateItemRequest
 from supabase_client import supabase
-from datetime import datetime
-from typing import Optional, List
+from datetime import datetime, timedelta
+from typing import Annotated, Optional, List
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import requests
 from utils import *
 from pydantic import BaseModel
 from uuid import UUID
+from notifications.deadline_scheduler import deadline_scheduler
+from lists.recommendation_queue import RecommendationQueue
 
 router = APIRouter()
 
@@ -39,6 +44,231 @@ def convert_datetime_to_iso(value):
     return value
 
 
+def group_by_list(rows: Optional[list]) -> dict:
+    """Group rows fetched for several lists by their list_id."""
+    grouped = {}
+    for row in rows or []:
+        grouped.setdefault(row["list_id"], []).append(row)
+    return grouped
+
+
+# Largest page GET /lists will return
+MAX_PAGE_SIZE = 100
+# Soft-deleted rows are purged by /cleanup after this many days
+TOMBSTONE_RETENTION_DAYS = 30
+# The sync watermark trails the read by this much, so writes stamped just
+# before the read but committed after it still fall in the next delta
+SYNC_TOKEN_MARGIN = timedelta(seconds=60)
+
+
+def encode_list_cursor(last_row: dict, sync_token: str) -> str:
+    """Opaque keyset cursor pointing just past `last_row` (newest-first order)."""
+    raw = json.dumps(
+        {"u": last_row["last_update"], "id": last_row["list_id"], "t": sync_token}
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_list_cursor(cursor: str) -> dict:
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        UUID(after["id"])
+        parse_sync_token(after["u"])
+        parse_sync_token(after["t"])
+        return after
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def parse_sync_token(value: str) -> str:
+    """Validate a client timestamp and normalise it to the stored ISO format."""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        raise HTTPException(400, "Invalid sync token")
+    return parsed.replace(tzinfo=None).isoformat()
+
+
+def build_list_payloads(rows: list) -> tuple[list, bool]:
+    """
+    Attach items and pending suggestions to list rows with two batched queries.
+    Returns the list payloads and whether any of them has a geo alert on.
+    """
+    if not rows:
+        return [], False
+
+    list_ids = [lst["list_id"] for lst in rows]
+    items_by_list = group_by_list(
+        supabase.table("lists_items")
+        .select("*")
+        .in_("list_id", list_ids)
+        .eq("is_deleted", False)
+        .execute()
+        .data
+    )
+    suggestions_by_list = group_by_list(
+        supabase.table("items_suggestions")
+        .select("*")
+        .in_("list_id", list_ids)
+        .eq("used", False)
+        .eq("rejected", False)
+        .execute()
+        .data
+    )
+
+    out = []
+    any_geo = False
+
+    for lst in rows:
+        lid = lst["list_id"]
+        items = items_by_list.get(lid, [])
+        suggestions = suggestions_by_list.get(lid, [])
+
+        if lst.get("geo_alert"):
+            any_geo = True
+
+        if any(it.get("geo_alert") for it in items):
+            any_geo = True
+
+        unchecked = sum(1 for i in items if not i.get("is_checked", False))
+
+        out.append(
+            {
+                "id": lid,
+                "name": lst["name"],
+                "deadline": lst["deadline"],
+                "geo_alert": lst["geo_alert"],
+                "pic_path": lst.get("pic_path"),
+                "last_update": lst.get("last_update"),
+                "items": items,
+                "unchecked_count": unchecked,
+                "suggested_items": suggestions,
+            }
+        )
+    return out, any_geo
+
+
+def user_has_geo_alerts(user_id: str) -> bool:
+    """Whether any live list or item of the user has geo alerts on."""
+    lists_on = (
+        supabase.table("lists")
+        .select("list_id")
+        .eq("user_id", user_id)
+        .eq("is_deleted", False)
+        .eq("geo_alert", True)
+        .limit(1)
+        .execute()
+        .data
+    )
+    if lists_on:
+        return True
+    items_on = (
+        supabase.table("lists_items")
+        .select("item_id, lists!inner(user_id)")
+        .eq("lists.user_id", user_id)
+        .eq("lists.is_deleted", False)
+        .eq("is_deleted", False)
+        .eq("geo_alert", True)
+        .limit(1)
+        .execute()
+        .data
+    )
+    return bool(items_on)
+
+
+def deleted_lists_since(user_id: str, since: str) -> list:
+    rows = (
+        supabase.table("lists")
+        .select("list_id")
+        .eq("user_id", user_id)
+        .eq("is_deleted", True)
+        .gt("deleted_at", since)
+        .execute()
+        .data
+    )
+    return [r["list_id"] for r in rows or []]
+
+
+def deleted_items_since(since: str, list_ids: list) -> list:
+    """
+    Items deleted after `since` from lists that are still live. Deleting an
+    item bumps its list, so only lists in the current delta need checking.
+    """
+    if not list_ids:
+        return []
+    rows = (
+        supabase.table("lists_items")
+        .select("item_id, list_id")
+        .in_("list_id", list_ids)
+        .eq("is_deleted", True)
+        .gt("deleted_at", since)
+        .execute()
+        .data
+    )
+    return rows or []
+
+
+# Upper bound on ML service calls in flight, shared by every list refresh
+ML_MAX_PARALLEL = int(os.getenv("ML_MAX_PARALLEL", "8"))
+# Names per /recommend_similar_products/batch request (the server's limit)
+ML_BATCH_SIZE = 256
+
+_ml_pool = ThreadPoolExecutor(max_workers=ML_MAX_PARALLEL, thread_name_prefix="ml")
+# One keep-alive connection per worker instead of a new TCP/TLS setup per call
+_ml_session = requests.Session()
+_ml_adapter = requests.adapters.HTTPAdapter(pool_maxsize=ML_MAX_PARALLEL)
+_ml_session.mount("http://", _ml_adapter)
+_ml_session.mount("https://", _ml_adapter)
+
+
+def _ml_get(url: str, params: dict) -> dict:
+    resp = _ml_session.get(url, params=params, timeout=20)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _ml_post(url: str, body: dict) -> dict:
+    resp = _ml_session.post(url, json=body, timeout=20)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def fetch_similar_products(ml_base: str, names, top_k: int = 5) -> set:
+    """
+    Similar products for every name, via /recommend_similar_products/batch.
+    Falls back to parallel per-name calls if the batch call fails (e.g. an
+    older model server without the endpoint).
+    """
+    names = list(names)
+    recs = set()
+    try:
+        for start in range(0, len(names), ML_BATCH_SIZE):
+            res = _ml_post(
+                f"{ml_base}/recommend_similar_products/batch",
+                {"product_names": names[start : start + ML_BATCH_SIZE], "top_k": top_k},
+            )
+            for row in res.get("results", []):
+                recs.update(row.get("similar_products", []))
+        return recs
+    except Exception as e:
+        print(f"[ML Error] batch similar failed, calling per item: {e}")
+
+    futures = {
+        _ml_pool.submit(
+            _ml_get,
+            f"{ml_base}/recommend_similar_products",
+            {"product_name": prod, "top_k": top_k},
+        ): prod
+        for prod in names
+    }
+    for future in as_completed(futures):
+        try:
+            recs.update(future.result().get("similar_products", []))
+        except Exception as e:
+            print(f"[ML Error] similar for '{futures[future]}': {e}")
+    return recs
+
+
 def fetch_and_store_recommendations(list_name: str, list_id: int):
     """Fetch recommendations from ML API both per-item and per-list,
     filter out existing items and any suggestions already used/rejected,
@@ -71,28 +301,14 @@ def fetch_and_store_recommendations(list_name: str, list_id: int):
         row["name"] for row in all_sugs if row.get("used") or row.get("rejected")
     }
 
-    # 3) Collect fresh recommendations from the ML service
-    recs = set()
-    for prod in existing_names:
-        try:
-            resp = requests.get(
-                f"{ml_base}/recommend_similar_products",
-                params={"product_name": prod, "top_k": 5},
-                timeout=20,
-            )
-            resp.raise_for_status()
-            recs.update(resp.json().get("similar_products", []))
-        except Exception as e:
-            print(f"[ML Error] similar for '{prod}': {e}")
-
+    # 3) Collect fresh recommendations from the ML service: the by-name call
+    # runs alongside one batched similarity call for all items
+    by_name = _ml_pool.submit(
+        _ml_get, f"{ml_base}/recommend_by_list_name", {"list_name": list_name}
+    )
+    recs = fetch_similar_products(ml_base, existing_names)
     try:
-        resp2 = requests.get(
-            f"{ml_base}/recommend_by_list_name",
-            params={"list_name": list_name},
-            timeout=20,
-        )
-        resp2.raise_for_status()
-        recs.update(resp2.json().get("recommended_products", []))
+        recs.update(by_name.result().get("recommended_products", []))
     except Exception as e:
         print(f"[ML Error] by-name for '{list_name}': {e}")
 
@@ -118,6 +334,12 @@ def fetch_and_store_recommendations(list_name: str, list_id: int):
         payload = [{"list_id": list_id, "name": item} for item in filtered]
         supabase.table("items_suggestions").insert(payload).execute()
 
+    # Suggestions are part of the list payload, so delta sync must see this
+    bump_list_timestamp(list_id)
+
+
+recommendation_queue = RecommendationQueue(fetch_and_store_recommendations)
+
 
 # -------------------------------------------------------------------------- #
 @router.post("/lists")
@@ -151,10 +373,11 @@ def create_list(user_list: UserList, user_id: str, token: str = Header(...)):
             raise HTTPException(500, "Insert failed")
 
         list_id = res.data[0]["list_id"]
-        # Fetch and store combined ML recommendations
-        fetch_and_store_recommendations(user_list.name, list_id)
+        deadline_scheduler.schedule_list(list_id, deadline_str)
+        # Suggestions are generated in the background and show up on next fetch
+        recommendation_queue.submit(list_id, user_list.name)
 
-        return {"list_id": list_id, "message": "List created with recommendations"}
+        return {"list_id": list_id, "message": "List created"}
 
     except Exception as e:
         print("[ERROR create_list]", e)
@@ -162,78 +385,113 @@ def create_list(user_list: UserList, user_id: str, token: str = Header(...)):
 
 
 @router.get("/lists")
-def get_user_lists(user_id: str, token: str = Header(...)):
+def get_user_lists(
+    user_id: str,
+    token: str = Header(...),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    response: Response = None,
+):
+    """
+    Without parameters, return every list of the user.
+
+    `limit`/`cursor` page through lists newest-first; pass `next_cursor` from
+    the previous page to get the next one. `since` (a previous `sync_token`)
+    returns only lists updated after it, plus tombstones for lists and items
+    deleted after it. A changed list is always sent whole, with its items and
+    pending suggestions, so the client can replace its copy.
+
+    Responses carry a weak ETag; a matching If-None-Match gets a 304.
+    """
     try:
         supabase.postgrest.auth(token)
 
-        rows = (
+        etag = weak_etag(lists_version(user_id), limit, cursor, since)
+        not_modified = conditional_response(response, if_none_match, etag)
+        if not_modified:
+            return not_modified
+
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            raise HTTPException(400, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        after = decode_list_cursor(cursor) if cursor else None
+        # Every page of one sync reports the watermark taken on its first page.
+        # Lists changed within the margin are sent again next time, which is
+        # harmless since the client replaces whole lists.
+        sync_token = (
+            after["t"] if after else (datetime.now() - SYNC_TOKEN_MARGIN).isoformat()
+        )
+
+        requested_delta = since is not None
+        if requested_delta:
+            since = parse_sync_token(since)
+            purge_horizon = datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+            if datetime.fromisoformat(since) < purge_horizon:
+                # Tombstones this old may have been purged by /cleanup
+                since = None
+        delta = since is not None
+
+        query = (
             supabase.table("lists")
             .select("*")
             .eq("user_id", user_id)
             .eq("is_deleted", False)
-            .order("last_update", desc=True)
-            .execute()
-        ).data
-
-        if not rows:
-            return {"lists": [], "any_geo_enabled": False}
-
-        out = []
-        any_geo = False
-
-        for lst in rows:
-            lid = lst["list_id"]
-            items = (
-                supabase.table("lists_items")
-                .select("*")
-                .eq("list_id", lid)
-                .eq("is_deleted", False)
-                .execute()
-                .data
-                or []
-            )
-            suggestions = (
-                supabase.table("items_suggestions")
-                .select("*")
-                .eq("list_id", lid)
-                .eq("used", False)
-                .eq("rejected", False)
-                .execute()
-                .data
-                or []
+        )
+        if delta:
+            query = query.gt("last_update", since)
+        if after:
+            query = query.or_(
+                f'last_update.lt."{after["u"]}",'
+                f'and(last_update.eq."{after["u"]}",list_id.lt.{after["id"]})'
             )
-
-            if lst.get("geo_alert"):
-                any_geo = True
-
-            if any(it.get("geo_alert") for it in items):
-                any_geo = True
-
-            unchecked_count = sum(1 for it in items if not it.get("is_checked", False))
-
-            unchecked = sum(1 for i in items if not i.get("is_checked", False))
-
-            out.append(
-                {
-                    "id": lid,
-                    "name": lst["name"],
-                    "deadline": lst["deadline"],
-                    "geo_alert": lst["geo_alert"],
-                    "pic_path": lst.get("pic_path"),
-                    "items": items,
-                    "unchecked_count": unchecked,
-                    "suggested_items": suggestions,
-                }
+        query = query.order("last_update", desc=True).order("list_id", desc=True)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = query.execute().data or []
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_list_cursor(rows[-1], sync_token)
+
+        out, any_geo = build_list_payloads(rows)
+        if limit is not None or delta:
+            # Only part of the account was loaded, so ask the database directly
+            any_geo = user_has_geo_alerts(user_id)
+
+        payload = {
+            "lists": out,
+            "any_geo_enabled": any_geo,
+            "sync_token": sync_token,
+        }
+        if limit is not None:
+            payload["next_cursor"] = next_cursor
+        if requested_delta:
+            payload["full_resync"] = not delta
+        if delta:
+            payload["deleted_items"] = deleted_items_since(
+                since, [lst["list_id"] for lst in rows]
             )
-        return {"lists": out, "any_geo_enabled": any_geo}
+            if after is None:
+                payload["deleted_list_ids"] = deleted_lists_since(user_id, since)
+        return payload
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("[ERROR get_user_lists]", e)
         raise HTTPException(500, "Failed to retrieve lists")
 
 
 @router.get("/lists/{list_id}")
-def get_list(list_id: str, token: str = Header(...)):
+def get_list(
+    list_id: str,
+    token: str = Header(...),
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    response: Response = None,
+):
     try:
         supabase.postgrest.auth(token)
 
@@ -249,6 +507,12 @@ def get_list(list_id: str, token: str = Header(...)):
         if not lst:
             raise HTTPException(status_code=404, detail="List not found")
 
+        # Item and suggestion writes bump last_update, so it versions the payload
+        etag = weak_etag(list_id, lst.get("last_update"))
+        not_modified = conditional_response(response, if_none_match, etag)
+        if not_modified:
+            return not_modified
+
         try:
             items = (
                 supabase.table("lists_items")
@@ -302,6 +566,8 @@ def get_list(list_id: str, token: str = Header(...)):
             "suggestions": filtered_suggestions,
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("[ERROR get_list]", e)
         raise HTTPException(500, "Failed to retrieve list")
@@ -397,6 +663,8 @@ def create_item_internal(
     if not res.data:
         raise HTTPException(500, "Insert failed")
 
+    if payload.get("deadline"):
+        deadline_scheduler.schedule_item(res.data[0]["item_id"], payload["deadline"])
     bump_list_timestamp(list_id)
 
     return {
@@ -439,6 +707,7 @@ def accept_suggestion(
         supabase.table("items_suggestions").update({"used": True}).eq(
             "suggestion_id", suggestion_id
         ).execute()
+        bump_list_timestamp(list_id)
 
         return {"message": "Suggestion accepted", "item_id": result["item_id"]}
 
@@ -448,12 +717,13 @@ def accept_suggestion(
 
 
 @router.post("/lists/{list_id}/suggestions/{suggestion_id}/reject")
-def reject_suggestion(suggestion_id: str, token: str = Header(...)):
+def reject_suggestion(list_id: str, suggestion_id: str, token: str = Header(...)):
     try:
         supabase.postgrest.auth(token)
         supabase.table("items_suggestions").update({"rejected": True}).eq(
             "suggestion_id", suggestion_id
         ).execute()
+        bump_list_timestamp(list_id)
         return {"message": "Suggestion rejected"}
     except Exception as e:
         print("[ERROR reject_suggestion]", e)
@@ -516,6 +786,9 @@ def update_list_deadline(list_id: str, body: dict, token: str = Header(...)):
             {"deadline": deadline, "deadline_notified": False}
         ).eq("list_id", list_id).is_("deadline", None).execute()
 
+        # Items moved along with the list are covered by the list's alert
+        deadline_scheduler.schedule_list(list_id, deadline)
+
         return {"message": "Deadline updated"}
 
     except Exception as e:
@@ -523,7 +796,7 @@ def update_list_deadline(list_id: str, body: dict, token: str = Header(...)):
         raise HTTPException(500, "Failed to update deadline")
 
 
-@router.post("/lists/{list_id}/recommendations", status_code=204)
+@router.post("/lists/{list_id}/recommendations", status_code=202)
 def generate_recommendations_for_list(list_id: UUID):
     list_id_str = str(list_id)
     res = (
@@ -535,6 +808,6 @@ def generate_recommendations_for_list(list_id: UUID):
 
     list_name = res.data["name"]
 
-    fetch_and_store_recommendations(list_name, list_id_str)
+    recommendation_queue.submit(list_id_str, list_name)
 
-    return
+    return {"message": "Recommendations queued"}
@@ -0,0 +1,66 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+# Lists whose suggestions are regenerated at the same time
+RECOMMENDATION_WORKERS = int(os.getenv("RECOMMENDATION_WORKERS", "2"))
+
+
+class RecommendationQueue:
+    """
+    Regenerates list suggestions off the request thread.
+
+    At most one job per list runs or waits at a time. Submitting a list that
+    is already queued doesn't start a second job. Instead, the running job
+    goes once more after it finishes, using the latest list name. That way
+    an item added mid-run still shows up in the suggestions.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str, str], None],
+        max_workers: int = RECOMMENDATION_WORKERS,
+    ):
+        self._generate = generate
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="recommendations"
+        )
+        self._lock = threading.Lock()
+        self._pending: dict[str, Future] = {}
+        self._rerun: dict[str, str] = {}  # list_id → newest list name
+
+    def submit(self, list_id, list_name: str) -> bool:
+        """Queue a refresh; returns False if one was already pending for the list."""
+        list_id = str(list_id)
+        with self._lock:
+            if list_id in self._pending:
+                self._rerun[list_id] = list_name
+                return False
+            self._pending[list_id] = self._pool.submit(self._run, list_id, list_name)
+        return True
+
+    def _run(self, list_id: str, list_name: str):
+        while True:
+            try:
+                self._generate(list_name, list_id)
+            except Exception as e:
+                print(f"[ERROR recommendations] list {list_id}: {e}")
+            with self._lock:
+                if list_id not in self._rerun:
+                    del self._pending[list_id]
+                    return
+                list_name = self._rerun.pop(list_id)
+
+    def is_pending(self, list_id) -> bool:
+        with self._lock:
+            return str(list_id) in self._pending
+
+    def join(self, timeout: Optional[float] = None):
+        """Block until every queued refresh has finished (used by tests/shutdown)."""
+        with self._lock:
+            pending = list(self._pending.values())
+        wait(pending, timeout=timeout)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -3,7 +3,7 @@ from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 from auth.routes import router as auth_router
-from lists.lists import router as lists_router, fetch_and_store_recommendations
+from lists.lists import router as lists_router, recommendation_queue
 from lists.items import router as items_router
 from lists.cleanup import router as lists_cleanup_router
 from profile.profile import router as profile_router
@@ -16,7 +16,13 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import asyncio
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from notifications.deadline_checker import check_deadlines_and_notify
+from notifications.deadline_scheduler import deadline_scheduler
+from notifications.availability_jobs import availability_queue
+from notifications.spatial_index import (
+    refresh_store_index,
+    STORE_INDEX_REFRESH_SECONDS,
+)
+from datetime import datetime
 
 app = FastAPI()
 
@@ -57,7 +63,7 @@ async def refresh_all_recommendations():
         or []
     )
     for lst in lists_data:
-        fetch_and_store_recommendations(lst["name"], lst["list_id"])
+        recommendation_queue.submit(lst["list_id"], lst["name"])
 
 
 @app.on_event("startup")
@@ -74,11 +80,23 @@ def start_scheduler():
 
 @app.on_event("startup")
 def start_notification_scheduler():
+    # Deadline alerts fire from an in-process priority queue at their due time
+    deadline_scheduler.start()
+
+    # Daily re-load picks up deadlines written by other replicas
     scheduler = BackgroundScheduler()
     scheduler.add_job(
-        check_deadlines_and_notify,
-        trigger=IntervalTrigger(hours=12),
-        name="deadline notification checker",
+        deadline_scheduler.reload,
+        trigger=IntervalTrigger(hours=24),
+        name="deadline scheduler reload",
+        replace_existing=True,
+    )
+    # Store proximity grid: built right away, then re-synced in the background
+    scheduler.add_job(
+        refresh_store_index,
+        trigger=IntervalTrigger(seconds=STORE_INDEX_REFRESH_SECONDS),
+        next_run_time=datetime.now(),
+        name="store index refresh",
         replace_existing=True,
     )
     scheduler.start()
@@ -90,6 +108,9 @@ def stop_notification_scheduler():
     scheduler = getattr(app.state, "notification_scheduler", None)
     if scheduler:
         scheduler.shutdown()
+    deadline_scheduler.stop()
+    availability_queue.shutdown()
+    recommendation_queue.shutdown()
 
 
 if __name__ == "__main__":
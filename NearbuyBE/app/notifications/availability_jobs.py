@@ -0,0 +1,142 @@
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, wait
+from typing import Callable, Hashable, Optional
+from uuid import UUID
+import requests
+
+ML_API_BASE_URL = os.getenv("ML_API_BASE_URL", "http://localhost:8000")
+# Upper bound on agent runs in flight at once (each one is an LLM + scrape pipeline)
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "4"))
+AGENT_TIMEOUT_SECONDS = 120
+
+Pair = tuple[UUID, str]  # (store_id, item_name)
+
+
+def check_availability_with_agent(product: str, store_name: str) -> Optional[dict]:
+    """
+    Ask the ML availability agent whether `product` is sold at `store_name`.
+    Returns the agent's JSON result, or None if the call failed.
+    """
+    print(f" Checking availability for: {product}")
+    try:
+        resp = requests.get(
+            f"{ML_API_BASE_URL}/check_product_availability",
+            params={"product": product, "store": store_name},
+            timeout=AGENT_TIMEOUT_SECONDS,
+        )
+    except requests.RequestException as e:
+        print(f"Agent call failed: {e}")
+        return None
+    if resp.status_code != 200:
+        print(f"Agent call failed: {resp.status_code} {resp.text}")
+        return None
+    print("[GEO NOTIFICATIONS] Agent called successfully")
+    return resp.json()
+
+
+class AvailabilityJobQueue:
+    """
+    Resolves missing (store, item) availability off the request thread.
+
+    Each job covers one group of pairs (e.g. everything a user is waiting on
+    for one store). Agent calls run on a bounded pool, a pair already being
+    checked for another group is shared rather than re-run, and a group that
+    is already queued is not queued twice. Once every pair in a group has an
+    answer, `on_done` is called with {(store_id, item_name): result or None}.
+    """
+
+    def __init__(self, max_concurrency: int = AGENT_MAX_CONCURRENCY):
+        self._agent_pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="availability-agent"
+        )
+        self._lock = threading.RLock()
+        self._pair_futures: dict[Pair, Future] = {}
+        # group_key → Future resolved once the group's on_done has run
+        self._pending_groups: dict[Hashable, Future] = {}
+
+    def submit(
+        self,
+        group_key: Hashable,
+        pairs: list[Pair],
+        store_names: dict[UUID, str],
+        on_done: Callable[[dict[Pair, Optional[dict]]], None],
+    ) -> bool:
+        """Queue a group of pairs; returns False if the group is already pending."""
+        with self._lock:
+            if group_key in self._pending_groups:
+                return False
+            futures = {
+                pair: self._pair_future(pair, store_names[pair[0]]) for pair in pairs
+            }
+            self._pending_groups[group_key] = Future()
+
+        # No thread waits on the group: every pair future counts down when it
+        # completes, and whichever finishes last runs on_done on its worker.
+        # Callbacks are attached outside the lock because a future that has
+        # already finished runs its callback right here.
+        remaining = [len(futures)]
+        countdown_lock = threading.Lock()
+
+        def countdown(_future: Future):
+            with countdown_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._finish(group_key, futures, on_done)
+
+        if not futures:
+            self._finish(group_key, futures, on_done)
+        for future in futures.values():
+            future.add_done_callback(countdown)
+        return True
+
+    def _pair_future(self, pair: Pair, store_name: str) -> Future:
+        future = self._pair_futures.get(pair)
+        if future is None:
+            store_id, item_name = pair
+            future = self._agent_pool.submit(
+                check_availability_with_agent, item_name, store_name
+            )
+            self._pair_futures[pair] = future
+            future.add_done_callback(lambda f, p=pair: self._forget_pair(p, f))
+        return future
+
+    def _forget_pair(self, pair: Pair, future: Future):
+        with self._lock:
+            if self._pair_futures.get(pair) is future:
+                del self._pair_futures[pair]
+
+    def _finish(self, group_key, futures: dict[Pair, Future], on_done):
+        try:
+            results = {}
+            for pair, future in futures.items():
+                try:
+                    results[pair] = future.result()
+                except (Exception, CancelledError) as e:
+                    print(f"[GEO NOTIFICATIONS] Agent job failed for {pair}: {e}")
+                    results[pair] = None
+            on_done(results)
+        except Exception as e:
+            print("[ERROR availability job]", e)
+        finally:
+            with self._lock:
+                done = self._pending_groups.pop(group_key, None)
+            if done is not None:
+                done.set_result(None)
+
+    def is_pending(self, group_key: Hashable) -> bool:
+        with self._lock:
+            return group_key in self._pending_groups
+
+    def join(self, timeout: Optional[float] = None):
+        """Block until every queued group has finished (used by tests/shutdown)."""
+        with self._lock:
+            pending = list(self._pending_groups.values())
+        wait(pending, timeout=timeout)
+
+    def shutdown(self):
+        self._agent_pool.shutdown(wait=False, cancel_futures=True)
+
+
+availability_queue = AvailabilityJobQueue()
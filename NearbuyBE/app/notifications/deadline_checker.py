@@ -1,150 +1,458 @@
 import logging
+import threading
+import uuid
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from typing import Iterator, Optional
+from sqlalchemy import String, and_, cast, func, insert, or_, text, true, update
 from sqlalchemy.orm import Session
 from uuid import UUID
-from .models import List, ListItem, DeviceToken, Alert, AlertsItems
-from .expo_push import send_expo_push
+from .models import (
+    List,
+    ListItem,
+    DeviceToken,
+    Alert,
+    AlertsItems,
+    DeadlineSweepCursor,
+)
+from .expo_push import send_expo_push_batch
 from .database import get_db
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 logger = logging.getLogger(__name__)
 
+# Number of alerts written per transaction
+DEADLINE_BATCH_SIZE = 500
 
-def check_deadlines_and_notify():
-    print("[DEADLINE] Starts looking for deadline notification")
-    db_gen = get_db()
-    db: Session = next(db_gen)
-    try:
-        now = datetime.now()
-        window_end = now + timedelta(hours=24)
-
-        list_alert_map: dict[UUID, UUID] = {}
-
-        # --- 1) Notify lists approaching deadline ---
-        due_lists = (
-            db.query(List)
-            .filter(
-                List.deadline.isnot(None),
-                List.deadline_notified == False,
-                List.deadline >= now,
-                List.deadline <= window_end,
-                List.is_deleted == False,
-            )
-            .all()
-        )
 
-        print(f"[DEADLINE] found {len(due_lists)} due lists")
+class _AlertUnit:
+    """One alert to write: its row, its alerts_items links and the rows it marks notified."""
 
-        for lst in due_lists:
-            user_id: UUID = lst.user_id
-            tokens = (
-                db.query(DeviceToken.expo_push_token)
-                .filter(DeviceToken.user_id == user_id)
-                .all()
-            )
+    def __init__(self, alert: dict, title: str, body: str, data: dict):
+        self.alert = alert
+        self.links: list[dict] = []
+        self.list_ids: list[UUID] = []
+        self.item_ids: list[UUID] = []
+        self.title = title
+        self.body = body
+        self.data = data
 
-            title = "List Deadline Approaching"
-            day = lst.deadline.day
-            month = lst.deadline.strftime("%B")
-            time = lst.deadline.strftime("%H:%M")
-            deadline_str = f"{day} {month} {time}"
-            body = f'Your list "{lst.name}" is due on {deadline_str}'
-
-            for (expo_token,) in tokens:
-                send_expo_push(expo_token, title, body, {"list_name": lst.name})
-
-            # create Alert record
-            alert = Alert(
-                user_id=user_id,
-                alert_type="deadline_alert",
-                last_triggered=now,
-                list_id=lst.list_id,
-            )
-            db.add(alert)
-            db.commit()  # populate alert.alert_id
 
-            list_alert_map[lst.list_id] = alert.alert_id
+def _list_alert_text(name: str, deadline: datetime) -> tuple[str, str]:
+    title = "List Deadline Approaching"
+    day = deadline.day
+    month = deadline.strftime("%B")
+    time = deadline.strftime("%H:%M")
+    deadline_str = f"{day} {month} {time}"
+    body = f'Your list "{name}" is due on {deadline_str}'
+    return title, body
 
-            # Mark list as notified
-            lst.deadline_notified = True
-            db.commit()
 
-        # --- 2) Notify individual items approaching deadline ---
-        due_items = (
-            db.query(ListItem)
-            .filter(
-                ListItem.deadline.isnot(None),
-                ListItem.deadline_notified == False,
-                ListItem.deadline >= now,
-                ListItem.deadline <= window_end,
-                ListItem.is_deleted == False,
-            )
-            .all()
+def _item_alert_text(name: str, deadline: datetime) -> tuple[str, str]:
+    title = "Item Deadline Approaching"
+    deadline_str = deadline.strftime("%Y-%m-%d %H:%M UTC")
+    body = f'Your item "{name}" is due on {deadline_str} (within 24 h).'
+    return title, body
+
+
+def _shard_clause(user_id_column, shard_index: int, shard_count: int):
+    """SQL filter keeping only users whose hash(user_id) falls in this shard."""
+    if shard_count <= 1:
+        return true()
+    bucket = (
+        func.hashtext(cast(user_id_column, String)).op("&")(0x7FFFFFFF) % shard_count
+    )
+    return bucket == shard_index
+
+
+def _after_cursor(deadline_column, id_column, cursor: Optional[tuple]):
+    """Keyset condition: (deadline, id) strictly after the cursor position."""
+    if cursor is None:
+        return true()
+    last_deadline, last_id = cursor
+    return or_(
+        deadline_column > last_deadline,
+        and_(deadline_column == last_deadline, id_column > last_id),
+    )
+
+
+def _list_alert_unit(list_id, user_id, name, deadline, now) -> _AlertUnit:
+    title, body = _list_alert_text(name, deadline)
+    unit = _AlertUnit(
+        {
+            "alert_id": uuid.uuid4(),
+            "user_id": user_id,
+            "alert_type": "deadline_alert",
+            "last_triggered": now,
+            "list_id": list_id,
+        },
+        title,
+        body,
+        {"list_name": name},
+    )
+    unit.list_ids.append(list_id)
+    return unit
+
+
+def _item_alert_unit(item_id, list_id, user_id, name, deadline, now) -> _AlertUnit:
+    title, body = _item_alert_text(name, deadline)
+    unit = _AlertUnit(
+        {
+            "alert_id": uuid.uuid4(),
+            "user_id": user_id,
+            "alert_type": "deadline_alert",
+            "last_triggered": now,
+        },
+        title,
+        body,
+        {"item_name": name},
+    )
+    unit.links.append(
+        {"alert_id": unit.alert["alert_id"], "item_id": item_id, "list_id": list_id}
+    )
+    unit.item_ids.append(item_id)
+    return unit
+
+
+def plan_list_page(
+    db: Session,
+    now: datetime,
+    window_end: datetime,
+    shard: tuple[int, int],
+    cursor: Optional[tuple],
+    limit: int,
+) -> tuple[list[_AlertUnit], Optional[tuple]]:
+    """
+    Next page (keyset on deadline, list_id) of due lists as alert units. Items
+    sharing their list's deadline are attached to that list's alert.
+    Returns (units, cursor of the last list) or ([], None) when done.
+    """
+    due_lists = (
+        db.query(List.list_id, List.user_id, List.name, List.deadline)
+        .filter(
+            List.deadline.isnot(None),
+            List.deadline_notified == False,
+            List.deadline >= now,
+            List.deadline <= window_end,
+            List.is_deleted == False,
+            _shard_clause(List.user_id, *shard),
+            _after_cursor(List.deadline, List.list_id, cursor),
         )
+        .order_by(List.deadline, List.list_id)
+        .limit(limit)
+        .all()
+    )
+    if not due_lists:
+        return [], None
 
-        print(f"[DEADLINE] found {len(due_items)} due items")
-
-        for item in due_items:
-            # find the owning list to get user_id
-            parent_list = db.query(List).filter(List.list_id == item.list_id).one()
-            user_id: UUID = parent_list.user_id
-
-            # insert to alerts_items if this item's deadline equals the list's deadline (list already notified)
-            if item.deadline == parent_list.deadline:
-                alert_id = list_alert_map.get(item.list_id)
-                if alert_id:
-                    stmt = (
-                        pg_insert(AlertsItems)
-                        .values(
-                            alert_id=alert_id,
-                            item_id=item.item_id,
-                            list_id=item.list_id,
-                        )
-                        .on_conflict_do_nothing()
-                    )
-                    db.execute(stmt)
+    units = {
+        list_id: _list_alert_unit(list_id, user_id, name, deadline, now)
+        for list_id, user_id, name, deadline in due_lists
+    }
+    same_deadline_items = (
+        db.query(ListItem.item_id, ListItem.list_id)
+        .join(List, List.list_id == ListItem.list_id)
+        .filter(
+            ListItem.list_id.in_(units.keys()),
+            ListItem.deadline == List.deadline,
+            ListItem.deadline_notified == False,
+            ListItem.is_deleted == False,
+        )
+        .all()
+    )
+    for item_id, list_id in same_deadline_items:
+        unit = units[list_id]
+        unit.links.append(
+            {"alert_id": unit.alert["alert_id"], "item_id": item_id, "list_id": list_id}
+        )
+        unit.item_ids.append(item_id)
 
-                    item.deadline_notified = True
-                    db.commit()
+    last = due_lists[-1]
+    return list(units.values()), (last.deadline, last.list_id)
 
-                continue
 
-            tokens = (
-                db.query(DeviceToken.expo_push_token)
-                .filter(DeviceToken.user_id == user_id)
-                .all()
-            )
+def plan_item_page(
+    db: Session,
+    now: datetime,
+    window_end: datetime,
+    shard: tuple[int, int],
+    cursor: Optional[tuple],
+    limit: int,
+) -> tuple[list[_AlertUnit], Optional[tuple]]:
+    """
+    Next page (keyset on deadline, item_id) of due items with their own alert.
+    Items whose deadline equals their list's are left to the list's alert.
+    """
+    due_items = (
+        db.query(
+            ListItem.item_id,
+            ListItem.list_id,
+            List.user_id,
+            ListItem.name,
+            ListItem.deadline,
+        )
+        .join(List, List.list_id == ListItem.list_id)
+        .filter(
+            ListItem.deadline.isnot(None),
+            ListItem.deadline_notified == False,
+            ListItem.deadline >= now,
+            ListItem.deadline <= window_end,
+            ListItem.is_deleted == False,
+            or_(List.deadline.is_(None), ListItem.deadline != List.deadline),
+            _shard_clause(List.user_id, *shard),
+            _after_cursor(ListItem.deadline, ListItem.item_id, cursor),
+        )
+        .order_by(ListItem.deadline, ListItem.item_id)
+        .limit(limit)
+        .all()
+    )
+    if not due_items:
+        return [], None
+
+    units = [_item_alert_unit(*row, now) for row in due_items]
+    last = due_items[-1]
+    return units, (last.deadline, last.item_id)
 
-            title = "Item Deadline Approaching"
-            deadline_str = item.deadline.strftime("%Y-%m-%d %H:%M UTC")
-            body = f'Your item "{item.name}" is due on {deadline_str} (within 24 h).'
 
-            for (expo_token,) in tokens:
-                send_expo_push(expo_token, title, body, {"item_name": item.name})
+def write_alert_batch(db: Session, units: list[_AlertUnit]) -> list[_AlertUnit]:
+    """
+    Write a batch of alert units with one statement per table (no commit).
 
-            # create Alert record
-            alert = Alert(
-                user_id=user_id, alert_type="deadline_alert", last_triggered=now
+    Rows are claimed first by flipping deadline_notified only where it is
+    still false, and only units whose row this call claimed are written.
+    Sweeps with different shard layouts (the scheduled 0/1 run, CLI shard
+    runs) can therefore overlap without alerting the same row twice.
+    Returns the units that were written.
+    """
+    list_ids = [list_id for unit in units for list_id in unit.list_ids]
+    claimed_lists = set()
+    if list_ids:
+        claimed_lists = set(
+            db.scalars(
+                update(List)
+                .where(List.list_id.in_(list_ids), List.deadline_notified == False)
+                .values(deadline_notified=True)
+                .returning(List.list_id)
             )
-            db.add(alert)
-            db.commit()  # populate alert.alert_id
-
-            # link alert to this item in join table
-            stmt = (
-                pg_insert(AlertsItems)
-                .values(
-                    alert_id=alert.alert_id, item_id=item.item_id, list_id=item.list_id
+        )
+
+    # Items only count through a unit that is still being written: a list
+    # unit's items stay with a list alert some other run already sent.
+    item_ids = [
+        item_id
+        for unit in units
+        if not unit.list_ids or unit.list_ids[0] in claimed_lists
+        for item_id in unit.item_ids
+    ]
+    claimed_items = set()
+    if item_ids:
+        claimed_items = set(
+            db.scalars(
+                update(ListItem)
+                .where(
+                    ListItem.item_id.in_(item_ids), ListItem.deadline_notified == False
                 )
-                .on_conflict_do_nothing()
+                .values(deadline_notified=True)
+                .returning(ListItem.item_id)
             )
-            db.execute(stmt)
+        )
+
+    written = []
+    for unit in units:
+        if unit.list_ids:
+            if unit.list_ids[0] not in claimed_lists:
+                continue
+        elif unit.item_ids[0] not in claimed_items:
+            continue
+        unit.links = [link for link in unit.links if link["item_id"] in claimed_items]
+        written.append(unit)
+    if not written:
+        return written
+
+    db.execute(insert(Alert), [unit.alert for unit in written])
 
-            # mark item notified
-            item.deadline_notified = True
+    links = [link for unit in written for link in unit.links]
+    if links:
+        db.execute(pg_insert(AlertsItems).on_conflict_do_nothing(), links)
+    return written
+
+
+_local_sweep_locks: dict[str, threading.Lock] = {}
+
+
+@contextmanager
+def _sweep_lock(db: Session, shard_key: str) -> Iterator[bool]:
+    """
+    Hold the sweep lock for one shard, yielding False if another run has it.
+    It only keeps two runs of the same shard from doing the work twice;
+    duplicate alerts are prevented by the row claim in write_alert_batch.
+    On Postgres this is a session advisory lock on a dedicated connection, so
+    it is shared by every API replica and worker; elsewhere it is per process.
+    """
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql":
+        key = zlib.crc32(f"deadline_sweep:{shard_key}".encode())
+        with bind.connect() as conn:
+            got = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": key}
+            ).scalar()
+            if not got:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+        return
+
+    lock = _local_sweep_locks.setdefault(shard_key, threading.Lock())
+    if not lock.acquire(blocking=False):
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        lock.release()
+
+
+def _load_cursor(db: Session, shard_key: str) -> tuple[str, Optional[tuple]]:
+    saved = db.get(DeadlineSweepCursor, shard_key)
+    if saved is None:
+        return "lists", None
+    print(f"[DEADLINE] resuming shard {shard_key} from {saved.phase} cursor")
+    if saved.last_deadline is None:
+        return saved.phase, None
+    return saved.phase, (saved.last_deadline, saved.last_id)
+
+
+def check_deadlines_and_notify(
+    shard_index: int = 0, shard_count: int = 1, batch_size: int = None
+) -> bool:
+    """
+    Notify every list and item whose deadline falls in the next 24 h.
+    Returns True if the sweep ran to completion, False if it failed or was
+    skipped because another run holds the shard.
+
+    Due rows are read in keyset-paginated pages of `batch_size`, and each page
+    is written in one transaction together with a persisted cursor, so memory
+    stays flat and a crashed sweep resumes after its last committed page
+    (then re-checks from the start for rows it would otherwise miss).
+    With shard_count > 1 only users with hash(user_id) % shard_count ==
+    shard_index are handled, letting several workers split the sweep.
+    """
+    batch_size = batch_size or DEADLINE_BATCH_SIZE
+    shard = (shard_index, shard_count)
+    shard_key = f"{shard_index}/{shard_count}"
+    print(f"[DEADLINE] Starts looking for deadline notification (shard {shard_key})")
+    db_gen = get_db()
+    db: Session = next(db_gen)
+    try:
+        with _sweep_lock(db, shard_key) as acquired:
+            if not acquired:
+                print(f"[DEADLINE] shard {shard_key} is already being swept, skipping")
+                return False
+
+            now = datetime.now()
+            window_end = now + timedelta(hours=24)
+            phase, cursor = _load_cursor(db, shard_key)
+            # A resumed run skipped everything before its cursor, including
+            # rows that became due while no sweep was running, so it ends
+            # with a full pass. Committed pages are already marked notified,
+            # which makes that pass cheap and safe to repeat.
+            full_pass_pending = cursor is not None or phase != "lists"
+            totals = {"lists": 0, "items": 0}
+
+            while True:
+                plan_page = plan_list_page if phase == "lists" else plan_item_page
+                units, next_cursor = plan_page(
+                    db, now, window_end, shard, cursor, batch_size
+                )
+                if not units:
+                    if phase == "lists":
+                        phase, cursor = "items", None
+                        continue
+                    if full_pass_pending:
+                        full_pass_pending = False
+                        phase, cursor = "lists", None
+                        continue
+                    break
+
+                try:
+                    units = write_alert_batch(db, units)
+                    db.merge(
+                        DeadlineSweepCursor(
+                            shard=shard_key,
+                            phase=phase,
+                            last_deadline=next_cursor[0],
+                            last_id=next_cursor[1],
+                        )
+                    )
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.error("Failed to commit deadline notifications: %s", e)
+                    raise
+
+                totals[phase] += len(units)
+                cursor = next_cursor
+                # Only push for alerts that were actually recorded
+                _push_units(db, units)
+
+            # Sweep finished: the next run starts from the beginning
+            db.query(DeadlineSweepCursor).filter_by(shard=shard_key).delete()
             db.commit()
+            print(
+                f"[DEADLINE] notified {totals['lists']} lists and "
+                f"{totals['items']} items (shard {shard_key})"
+            )
+            return True
 
     except Exception as e:
         db.rollback()
-        logger.error("Failed to commit deadline notifications: %s", e)
+        logger.error("Deadline sweep failed: %s", e)
+        return False
     finally:
         db.close()
+
+
+def _push_units(db: Session, units: list[_AlertUnit]):
+    """Push every unit's message to all devices of its user, as one batch."""
+    user_ids = {unit.alert["user_id"] for unit in units}
+    tokens_by_user: dict[UUID, list[str]] = defaultdict(list)
+    for user_id, expo_token in db.query(
+        DeviceToken.user_id, DeviceToken.expo_push_token
+    ).filter(DeviceToken.user_id.in_(user_ids)):
+        tokens_by_user[user_id].append(expo_token)
+
+    send_expo_push_batch(
+        [
+            (expo_token, unit.title, unit.body, unit.data)
+            for unit in units
+            for expo_token in tokens_by_user.get(unit.alert["user_id"], [])
+        ]
+    )
+
+
+def _run_shard(args: tuple[int, int]):
+    check_deadlines_and_notify(*args)
+
+
+if __name__ == "__main__":
+    # Run from NearbuyBE/app: python -m notifications.deadline_checker --shards 4
+    import argparse
+    from multiprocessing import Pool
+
+    parser = argparse.ArgumentParser(description="Run the deadline sweep")
+    parser.add_argument("--shards", type=int, default=1, help="total shard count")
+    parser.add_argument(
+        "--shard", type=int, default=None, help="run only this shard index"
+    )
+    args = parser.parse_args()
+
+    if args.shard is not None:
+        check_deadlines_and_notify(args.shard, args.shards)
+    else:
+        with Pool(processes=args.shards) as pool:
+            pool.map(_run_shard, [(i, args.shards) for i in range(args.shards)])
@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Union
+from uuid import UUID
+from sqlalchemy.orm import Session
+
+from .models import List, ListItem
+from .database import get_db
+from .deadline_checker import check_deadlines_and_notify
+
+# Deadline alerts go out this long before the deadline ("due within 24 h")
+NOTIFY_LEAD = timedelta(hours=24)
+# Upper bound on one sleep, so clock changes can't stall the loop for long
+MAX_SLEEP_SECONDS = 3600
+# Due deadlines are retried after this long when their sweep didn't run or failed
+SWEEP_RETRY_SECONDS = 60
+
+
+def parse_deadline(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """
+    Parse a deadline as the API receives it. Like the `timestamp without time
+    zone` columns it is stored in, any UTC offset is dropped, not converted.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value.replace(tzinfo=None)
+
+
+class DeadlineScheduler:
+    """
+    Min-heap of upcoming deadline notification times.
+
+    Rather than polling, the sweep runs when the earliest entry comes due
+    (deadline - NOTIFY_LEAD). At that moment every un-notified row within the
+    24 h window is exactly the set of rows that has come due, so a sweep only
+    touches deadlines that actually fire. Entries for deadlines that were later
+    changed or cleared are skipped lazily when popped.
+
+    The sweep returns True once it has run to completion. If it returns False
+    (e.g. another worker holds the shard lock) or raises, the entries it was
+    run for go back on the heap and fire again after SWEEP_RETRY_SECONDS.
+    """
+
+    def __init__(
+        self,
+        sweep: Callable[[], bool] = None,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self._sweep = sweep or check_deadlines_and_notify
+        self._clock = clock
+        self._heap: list[tuple[datetime, int, str, UUID, datetime]] = []
+        self._current: dict[tuple[str, UUID], datetime] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._current)
+
+    # ---------- scheduling ----------
+
+    def _schedule(self, kind: str, row_id: UUID, deadline):
+        deadline = parse_deadline(deadline)
+        key = (kind, UUID(str(row_id)))
+        with self._cond:
+            if deadline is None:
+                self._current.pop(key, None)
+                return
+            if self._current.get(key) == deadline:
+                return
+            self._current[key] = deadline
+            entry = (deadline - NOTIFY_LEAD, next(self._seq), *key, deadline)
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+
+    def schedule_list(self, list_id: UUID, deadline):
+        """Add or move a list's deadline (None clears it)."""
+        self._schedule("list", list_id, deadline)
+
+    def schedule_item(self, item_id: UUID, deadline):
+        """Add or move an item's deadline (None clears it)."""
+        self._schedule("item", item_id, deadline)
+
+    def load(self, db: Session):
+        """(Re)load every future, not yet notified deadline from the database."""
+        now = self._clock()
+        lists = db.query(List.list_id, List.deadline).filter(
+            List.deadline.isnot(None),
+            List.deadline_notified == False,
+            List.deadline >= now,
+            List.is_deleted == False,
+        )
+        items = db.query(ListItem.item_id, ListItem.deadline).filter(
+            ListItem.deadline.isnot(None),
+            ListItem.deadline_notified == False,
+            ListItem.deadline >= now,
+            ListItem.is_deleted == False,
+        )
+        with self._cond:
+            self._heap.clear()
+            self._current.clear()
+        for list_id, deadline in lists:
+            self.schedule_list(list_id, deadline)
+        for item_id, deadline in items:
+            self.schedule_item(item_id, deadline)
+        print(f"[DEADLINE] scheduler loaded {len(self)} upcoming deadlines")
+
+    def reload(self):
+        db_gen = get_db()
+        db: Session = next(db_gen)
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    # ---------- firing ----------
+
+    def _pop_due(self, now: datetime) -> list[tuple[str, UUID, datetime]]:
+        """Pop every live entry whose fire time has passed."""
+        fired = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, kind, row_id, deadline = heapq.heappop(self._heap)
+                if self._current.get((kind, row_id)) != deadline:
+                    continue  # deadline changed or cleared since it was queued
+                del self._current[(kind, row_id)]
+                fired.append((kind, row_id, deadline))
+        return fired
+
+    def _retry(self, entries: list[tuple[str, UUID, datetime]], fire_at: datetime):
+        """Put popped entries back, unless their deadline was set again meanwhile."""
+        with self._cond:
+            for kind, row_id, deadline in entries:
+                if (kind, row_id) in self._current:
+                    continue
+                self._current[(kind, row_id)] = deadline
+                heapq.heappush(
+                    self._heap, (fire_at, next(self._seq), kind, row_id, deadline)
+                )
+            self._cond.notify()
+
+    def run_pending(self) -> int:
+        """Run one sweep if any deadline has come due; returns how many fired."""
+        now = self._clock()
+        fired = self._pop_due(now)
+        if fired:
+            print(f"[DEADLINE] {len(fired)} deadline(s) due, running sweep")
+            try:
+                swept = self._sweep()
+            except Exception as e:
+                print("[ERROR deadline scheduler]", e)
+                swept = False
+            if not swept:
+                print(
+                    f"[DEADLINE] sweep did not complete, retrying in {SWEEP_RETRY_SECONDS}s"
+                )
+                self._retry(fired, now + timedelta(seconds=SWEEP_RETRY_SECONDS))
+        return len(fired)
+
+    def seconds_until_next(self) -> Optional[float]:
+        with self._cond:
+            if not self._heap:
+                return None
+            return (self._heap[0][0] - self._clock()).total_seconds()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                wait = self.seconds_until_next()
+                if wait is None or wait > 0:
+                    timeout = MAX_SLEEP_SECONDS if wait is None else wait
+                    self._cond.wait(min(timeout, MAX_SLEEP_SECONDS))
+                    continue
+            self.run_pending()
+
+    def start(self):
+        """Load upcoming deadlines and start the firing thread."""
+        self.reload()
+        with self._cond:
+            self._stopped = False
+        self._thread = threading.Thread(
+            target=self._loop, name="deadline-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+deadline_scheduler = DeadlineScheduler()
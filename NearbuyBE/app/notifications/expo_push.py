@@ -1,5 +1,13 @@
+import importlib.util
 import json
-import requests
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+import httpx
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request
 from uuid import UUID
@@ -10,50 +18,191 @@ SA_JSON = "../../NearBuyFE/firebase-service-account.json"
 # Your Firebase project ID (from Firebase Console → Project settings → General)
 PROJECT_ID = "nearbuy-b2480"
 FCM_V1_URL = f"https://fcm.googleapis.com/v1/projects/{PROJECT_ID}/messages:send"
+# How many pushes may be in flight at once when sending a batch
+PUSH_MAX_CONCURRENCY = int(os.getenv("PUSH_MAX_CONCURRENCY", "16"))
 # ──────────────────────────────────────────────────────────────────────────────
 
 
-def _get_fcm_access_token() -> str:
-    """Mint an OAuth2 access token for FCM v1."""
-    scopes = ["https://www.googleapis.com/auth/firebase.messaging"]
-    creds = service_account.Credentials.from_service_account_file(
-        SA_JSON, scopes=scopes
-    )
-    creds.refresh(Request())
-    return creds.token
+# Re-mint the access token this long before Google's expiry (tokens live ~1 h)
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
 
 
-def send_expo_push(to_token: str, title: str, body: str, data: dict = None) -> bool:
+class _FcmTokenCache:
     """
-    Send a push notification via FCM HTTP v1.
-    Returns True on success, False otherwise.
+    Process-wide holder for the FCM OAuth2 access token.
+
+    The service-account file is read once and the token is only re-minted when
+    it is missing or about to expire; concurrent senders that find it stale wait
+    on a single refresh instead of each hitting Google's token endpoint.
     """
+
+    def __init__(self, sa_json: str, scopes: list[str]):
+        self.sa_json = sa_json
+        self.scopes = scopes
+        self._creds = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self) -> bool:
+        creds = self._creds
+        if creds is None or not creds.token or creds.expiry is None:
+            return False
+        # google-auth reports expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return creds.expiry - TOKEN_REFRESH_MARGIN > now
+
+    def get(self) -> str:
+        if self._is_fresh():
+            return self._creds.token
+        with self._lock:
+            if not self._is_fresh():
+                if self._creds is None:
+                    self._creds = service_account.Credentials.from_service_account_file(
+                        self.sa_json, scopes=self.scopes
+                    )
+                self._creds.refresh(Request())
+            return self._creds.token
+
+    def invalidate(self):
+        """Drop the current token so the next sender mints a new one."""
+        with self._lock:
+            if self._creds is not None:
+                self._creds.token = None
+
+
+_token_cache = _FcmTokenCache(
+    SA_JSON, ["https://www.googleapis.com/auth/firebase.messaging"]
+)
+
+
+def _get_fcm_access_token() -> str:
+    """Return a cached OAuth2 access token for FCM v1, minting one if needed."""
+    return _token_cache.get()
+
+
+# (token, title, body, data) for one push
+PushMessage = tuple[str, str, str, Optional[dict]]
+
+# Statuses worth retrying: rate limiting and transient FCM/backend errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _build_payload(to_token: str, title: str, body: str, data: dict = None) -> dict:
     # Convert any UUIDs to strings
     clean_data = {}
     if data:
         for key, value in data.items():
             clean_data[key] = str(value) if isinstance(value, UUID) else value
 
-    # Build the FCM message payload
-    message = {
-        "token": to_token,
-        "notification": {"title": title, "body": body},
-        "data": clean_data,
+    # Build the FCM message payload, wrapped under top-level "message" as
+    # required by HTTP v1
+    return {
+        "message": {
+            "token": to_token,
+            "notification": {"title": title, "body": body},
+            "data": clean_data,
+        }
     }
 
-    # Mint a fresh OAuth2 token
-    access_token = _get_fcm_access_token()
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json; UTF-8",
-    }
 
-    # Wrap under top-level "message" as required by HTTP v1
-    payload = {"message": message}
-    resp = requests.post(FCM_V1_URL, headers=headers, json=payload)
+class PushDispatcher:
+    """
+    Delivers FCM v1 pushes over one pooled, keep-alive HTTP client (HTTP/2 when
+    the `h2` package is installed), with bounded concurrency for batches and
+    exponential backoff on 429/5xx responses and connection errors.
+    """
+
+    def __init__(
+        self,
+        url: str = FCM_V1_URL,
+        token_provider: Callable[[], str] = None,
+        max_concurrency: int = PUSH_MAX_CONCURRENCY,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        timeout: float = 10.0,
+    ):
+        self.url = url
+        self.token_provider = token_provider or _get_fcm_access_token
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self._client = httpx.Client(
+            http2=self.http2,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+
+    def _backoff(self, attempt: int, resp: Optional[httpx.Response]) -> float:
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2**attempt), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def send(self, to_token: str, title: str, body: str, data: dict = None) -> bool:
+        """Send one push, retrying transient failures. Returns True on success."""
+        payload = _build_payload(to_token, title, body, data)
+        for attempt in range(self.max_retries + 1):
+            resp = None
+            try:
+                headers = {
+                    "Authorization": f"Bearer {self.token_provider()}",
+                    "Content-Type": "application/json; UTF-8",
+                }
+                resp = self._client.post(self.url, headers=headers, json=payload)
+            except httpx.TransportError as e:
+                print("FCM v1 push transport error:", e)
+            else:
+                if resp.status_code == 200:
+                    return True
+                if resp.status_code == 401:
+                    # Token was revoked/expired early: mint a new one and retry
+                    _token_cache.invalidate()
+                elif resp.status_code not in RETRYABLE_STATUSES:
+                    break
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, resp))
+
+        if resp is not None:
+            print("FCM v1 push failed:", resp.status_code, resp.text)
+        return False
+
+    def send_batch(self, messages: list[PushMessage]) -> list[bool]:
+        """Send many pushes concurrently; results are in the order of `messages`."""
+        if not messages:
+            return []
+        if len(messages) == 1:
+            return [self.send(*messages[0])]
+        workers = min(self.max_concurrency, len(messages))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda m: self.send(*m), messages))
+
+    def close(self):
+        self._client.close()
+
+
+push_dispatcher = PushDispatcher()
 
-    if resp.status_code == 200:
-        return True
 
-    print("FCM v1 push failed:", resp.status_code, resp.text)
-    return False
+def send_expo_push(to_token: str, title: str, body: str, data: dict = None) -> bool:
+    """
+    Send a push notification via FCM HTTP v1.
+    Returns True on success, False otherwise.
+    """
+    return push_dispatcher.send(to_token, title, body, data)
+
+
+def send_expo_push_batch(messages: list[PushMessage]) -> list[bool]:
+    """
+    Send many (token, title, body, data) pushes via FCM HTTP v1 over the shared
+    connection pool. Returns one success flag per message.
+    """
+    return push_dispatcher.send_batch(messages)
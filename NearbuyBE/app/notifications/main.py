@@ -1,4 +1,5 @@
 import os
+from functools import partial
 from datetime import datetime, timedelta, timezone
 import uuid
 from uuid import UUID
@@ -32,10 +33,10 @@ from .models import (
     Alert,
     AlertsItems,
 )
-from .utils import haversine_distance
-from .expo_push import send_expo_push
+from .spatial_index import get_store_index
+from .expo_push import send_expo_push_batch
 from .database import get_db, engine
-import requests
+from .availability_jobs import availability_queue
 
 router = APIRouter()
 
@@ -200,6 +201,178 @@ def get_matching_item_names(db: Session, user_id: UUID, store_id: int) -> list[s
     return [row[0] for row in matching_item_name_rows]  # e.g. ["Milk", "Eggs"]
 
 
+# -------------------- 9. Helper: availability for many (store, item) pairs --------------------
+
+
+def get_availability_for_pairs(
+    db: Session, pairs: list[tuple[UUID, str]]
+) -> tuple[dict[tuple[UUID, str], StoreItemAvailability], dict[UUID, list[str]]]:
+    """
+    Fetch cached availability for every (store_id, item_name) pair in one query.
+    Returns ({(store_id, item_name): record}, {store_id: [item names with no record]}).
+    """
+    if not pairs:
+        return {}, {}
+
+    wanted = set(pairs)
+    rows = (
+        db.query(StoreItemAvailability)
+        .filter(
+            StoreItemAvailability.store_id.in_({store_id for store_id, _ in wanted}),
+            StoreItemAvailability.item_name.in_({name for _, name in wanted}),
+        )
+        .all()
+    )
+    found = {
+        (rec.store_id, rec.item_name): rec
+        for rec in rows
+        if (rec.store_id, rec.item_name) in wanted
+    }
+
+    missing: dict[UUID, list[str]] = {}
+    for store_id, name in pairs:
+        if (store_id, name) not in found:
+            missing.setdefault(store_id, []).append(name)
+    return found, missing
+
+
+def get_user_geo_alert_items(db: Session, user_id: UUID, now_ts: datetime):
+    """Unchecked geo-alert items on the user's lists whose deadline hasn't passed."""
+    return (
+        db.query(ListItem)
+        .join(List, List.list_id == ListItem.list_id)
+        .filter(
+            List.user_id == user_id,
+            ListItem.geo_alert == True,
+            ListItem.is_deleted == False,
+            ListItem.is_checked == False,
+            (List.deadline.is_(None) | (List.deadline >= now_ts)),
+            (ListItem.deadline.is_(None) | (ListItem.deadline >= now_ts)),
+        )
+        .all()
+    )
+
+
+# -------------------- 10. Helper: record & push one store's geo alert --------------------
+
+
+def send_geo_alert(
+    db: Session,
+    user_id: UUID,
+    store_id: UUID,
+    store_name: str,
+    item_rows: list[ListItem],
+    available_names: list[str],
+    prox: UserStoreProximity,
+):
+    """
+    Insert the geo Alert + alerts_items links for the available items, mark the
+    proximity row as notified and push to every device of the user.
+    """
+    print(f"[DEBUG] MATCH! sending push for {store_name} with items: {available_names}")
+    batch = Alert(
+        user_id=user_id,
+        store_id=store_id,
+        alert_type="geo_alert",
+        last_triggered=datetime.now(),
+    )
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+
+    for item in item_rows:
+        if item.name in available_names:
+            stmt = (
+                pg_insert(AlertsItems)
+                .values(
+                    alert_id=batch.alert_id,
+                    item_id=item.item_id,
+                    list_id=item.list_id,
+                )
+                .on_conflict_do_nothing()
+            )
+            db.execute(stmt)
+
+    prox.notified = True
+    db.commit()
+
+    title = f"{store_name} has your items!"
+    shown = available_names[:3]
+    more = len(available_names) - len(shown)
+    body = f"You’re near a store that may have: {', '.join(shown)}" + (
+        f" and more from your shopping lists" if more > 0 else ""
+    )
+
+    # Send push to all tokens for this user
+    tokens = (
+        db.query(DeviceToken.expo_push_token)
+        .filter(DeviceToken.user_id == user_id)
+        .all()
+    )
+    send_expo_push_batch(
+        [(expo_token, title, body, {"store": store_name}) for (expo_token,) in tokens]
+    )
+
+
+def available_item_names(item_rows, store_id, availability) -> list[str]:
+    return [
+        item.name
+        for item in item_rows
+        if (rec := availability.get((store_id, item.name))) is not None
+        and rec.prediction
+    ]
+
+
+def finish_geo_alert(user_id: UUID, store_id: UUID, store_name: str, results: dict):
+    """
+    Runs on the availability queue once the agent has answered for every missing
+    item at a store: store the answers, then alert the user if they are still
+    near the store and haven't been notified yet.
+    """
+    db_gen = get_db()
+    db: Session = next(db_gen)
+    try:
+        now_ts = datetime.now().replace(tzinfo=None)
+        for (result_store_id, name), result in results.items():
+            if result is None:
+                continue
+            db.merge(
+                StoreItemAvailability(
+                    store_id=result_store_id,
+                    last_run=now_ts,
+                    prediction=bool(result.get("answer", False)),
+                    confidence=float(result.get("confidence", 0.0)),
+                    reason=result.get("reason"),
+                    item_name=name,
+                )
+            )
+        db.commit()
+
+        prox = (
+            db.query(UserStoreProximity)
+            .filter_by(user_id=user_id, store_id=store_id)
+            .first()
+        )
+        if not prox or prox.notified:
+            return
+
+        item_rows = get_user_geo_alert_items(db, user_id, now_ts)
+        availability, _ = get_availability_for_pairs(
+            db, [(store_id, item.name) for item in item_rows]
+        )
+        available_names = available_item_names(item_rows, store_id, availability)
+        print("available_names: ", available_names)
+        if available_names:
+            send_geo_alert(
+                db, user_id, store_id, store_name, item_rows, available_names, prox
+            )
+    except Exception as e:
+        db.rollback()
+        print("[ERROR finish_geo_alert]", e)
+    finally:
+        db.close()
+
+
 @router.post("/location_update")
 def location_update(req: Dict, token: str = Header(...)):
     try:
@@ -220,162 +393,82 @@ def location_update(req: Dict, token: str = Header(...)):
 
         now_ts = datetime.now().replace(tzinfo=None)
 
-        item_rows = (
-            db.query(ListItem)
-            .join(List, List.list_id == ListItem.list_id)
-            .filter(
-                List.user_id == user_id,
-                ListItem.geo_alert == True,
-                ListItem.is_deleted == False,
-                ListItem.is_checked == False,
-                (List.deadline.is_(None) | (List.deadline >= now_ts)),
-                (ListItem.deadline.is_(None) | (ListItem.deadline >= now_ts)),
-            )
-            .all()
-        )
+        item_rows = get_user_geo_alert_items(db, user_id, now_ts)
         if not item_rows:
             return {"status": "ok", "detail": "No geo_alert items", "alerts": []}
 
-        store_rows = db.query(
-            Store.store_id, Store.name, Store.latitude, Store.longitude
-        ).all()
-
         PROXIMITY_RADIUS = 500.0
-        alerts = []
 
-        for store_id, store_name, store_lat, store_lon in store_rows:
-            dist = haversine_distance(lat, lon, store_lat, store_lon)
+        nearby_stores = get_store_index(db).within(lat, lon, PROXIMITY_RADIUS)
+        nearby_ids = [row[0] for row in nearby_stores]
 
-            if dist <= PROXIMITY_RADIUS:
-                print(store_name, " is nearby")
-                prox = (
-                    db.query(UserStoreProximity)
-                    .filter_by(user_id=user_id, store_id=store_id)
-                    .first()
+        prox_by_store = {}
+        if nearby_ids:
+            prox_by_store = {
+                prox.store_id: prox
+                for prox in db.query(UserStoreProximity).filter(
+                    UserStoreProximity.user_id == user_id,
+                    UserStoreProximity.store_id.in_(nearby_ids),
                 )
-                if not prox:
-                    prox = UserStoreProximity(
+            }
+
+        # Stores the user has lingered near for 2+ minutes without an alert yet
+        due_stores = []
+        for store_id, store_name, store_lat, store_lon in nearby_stores:
+            print(store_name, " is nearby")
+            prox = prox_by_store.get(store_id)
+            if not prox:
+                db.add(
+                    UserStoreProximity(
                         user_id=user_id,
                         store_id=store_id,
                         entered_at=now_ts,
                         notified=False,
                     )
-                    db.add(prox)
-                    db.commit()
-                elif not prox.notified:
-                    entered = prox.entered_at
-                    if entered.tzinfo is not None:
-                        entered = entered.astimezone(timezone.utc).replace(tzinfo=None)
-
-                    available_names = []
-                    if (now_ts.replace(tzinfo=None) - entered) >= timedelta(minutes=2):
-                        for item in item_rows:
-                            print(f" Checking availability for: {item.name}")
-                            rec = (
-                                db.query(StoreItemAvailability)
-                                .filter_by(item_name=item.name, store_id=store_id)
-                                .first()
-                            )
-                            if rec:
-                                print("found availability record")
-                                if rec.prediction:
-                                    available_names.append(item.name)
-                            else:
-                                resp = requests.get(
-                                    "http://localhost:8000/check_product_availability",
-                                    params={"product": item.name, "store": store_name},
-                                )
-                                if resp.status_code != 200:
-                                    print(
-                                        f"Agent call failed: {resp.status_code} {resp.text}"
-                                    )
-                                    continue
-                                print("[GEO NOTIFICATIONS] Agent called successfully")
-                                result = resp.json()
-                                confidence = float(result.get("confidence", 0.0))
-                                available_flag = bool(result.get("answer", False))
-                                reason_text = result.get("reason")
-                                new_rec = StoreItemAvailability(
-                                    store_id=store_id,
-                                    last_run=now_ts,
-                                    prediction=available_flag,
-                                    confidence=confidence,
-                                    reason=reason_text,
-                                    item_name=item.name,
-                                )
-                                db.add(new_rec)
-                                db.commit()
-                                if available_flag:
-                                    available_names.append(item.name)
-                    print("available_names: ", available_names)
-                    if available_names:
-                        print(
-                            f"[DEBUG] MATCH! sending push for {store_name} with items: {available_names}"
-                        )
-                        alerts.append(
-                            {
-                                "store_id": str(store_id),
-                                "store_name": store_name,
-                                "items": available_names,
-                            }
-                        )
-
-                        now_utc = datetime.now()
-                        batch = Alert(
-                            user_id=user_id,
-                            store_id=store_id,
-                            alert_type="geo_alert",
-                            last_triggered=now_utc,
-                        )
-                        db.add(batch)
-                        db.commit()
-                        db.refresh(batch)
-
-                        for item in item_rows:
-                            if item.name in available_names:
-                                stmt = (
-                                    pg_insert(AlertsItems)
-                                    .values(
-                                        alert_id=batch.alert_id,
-                                        item_id=item.item_id,
-                                        list_id=item.list_id,
-                                    )
-                                    .on_conflict_do_nothing()
-                                )
-                                db.execute(stmt)
-                        db.commit()
-
-                        prox.notified = True
-                        db.commit()
-            else:
-                prox = (
-                    db.query(UserStoreProximity)
-                    .filter_by(user_id=user_id, store_id=store_id)
-                    .first()
-                )
-                if prox:
-                    db.delete(prox)
-                    db.commit()
-
-        if alerts:
-            for alert in alerts:
-                title = f"{alert['store_name']} has your items!"
-                shown = alert["items"][:3]
-                more = len(alert["items"]) - len(shown)
-                body = f"You’re near a store that may have: {', '.join(shown)}" + (
-                    f" and more from your shopping lists" if more > 0 else ""
                 )
+            elif not prox.notified:
+                entered = prox.entered_at
+                if entered.tzinfo is not None:
+                    entered = entered.astimezone(timezone.utc).replace(tzinfo=None)
+                if (now_ts - entered) >= timedelta(minutes=2):
+                    due_stores.append((store_id, store_name, prox))
+        db.commit()
+
+        item_names = {item.name for item in item_rows}
+        pairs = [
+            (store_id, name) for store_id, _, _ in due_stores for name in item_names
+        ]
+        availability, missing_by_store = get_availability_for_pairs(db, pairs)
+
+        # Pairs without a cached prediction go to the agent in the background;
+        # that store's alert is sent once the answers come back.
+        store_names = {store_id: store_name for store_id, store_name, _ in due_stores}
+        for store_id, missing_names in missing_by_store.items():
+            availability_queue.submit(
+                (user_id, store_id),
+                [(store_id, name) for name in missing_names],
+                store_names,
+                partial(finish_geo_alert, user_id, store_id, store_names[store_id]),
+            )
 
-                # Send push to all tokens for this user
-                tokens = (
-                    db.query(DeviceToken.expo_push_token)
-                    .filter(DeviceToken.user_id == user_id)
-                    .all()
+        for store_id, store_name, prox in due_stores:
+            if store_id in missing_by_store:
+                continue
+            available_names = available_item_names(item_rows, store_id, availability)
+            print("available_names: ", available_names)
+            if available_names:
+                send_geo_alert(
+                    db, user_id, store_id, store_name, item_rows, available_names, prox
                 )
-                for (expo_token,) in tokens:
-                    send_expo_push(
-                        expo_token, title, body, {"store": alert["store_name"]}
-                    )
+
+        # Forget proximity state for every store the user has walked away from
+        stale = db.query(UserStoreProximity).filter(
+            UserStoreProximity.user_id == user_id
+        )
+        if nearby_ids:
+            stale = stale.filter(UserStoreProximity.store_id.notin_(nearby_ids))
+        if stale.delete(synchronize_session=False):
+            db.commit()
 
         return {"status": "ok", "detail": "Processed location update"}
 
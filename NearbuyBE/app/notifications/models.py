@@ -131,7 +131,9 @@ class UserStoreProximity(Base):
         nullable=False,
     )
     store_id = Column(
-        Integer, ForeignKey("stores.store_id", ondelete="CASCADE"), nullable=False
+        PGUUID(as_uuid=True),
+        ForeignKey("stores.store_id", ondelete="CASCADE"),
+        nullable=False,
     )
     entered_at = Column(DateTime(timezone=True), nullable=False)
     notified = Column(Boolean, default=False, nullable=False)
@@ -192,3 +194,22 @@ class AlertsItems(Base):
         ForeignKey("lists.list_id", ondelete="CASCADE"),
         nullable=False,
     )
+
+
+class DeadlineSweepCursor(Base):
+    """
+    Progress marker of an in-flight deadline sweep, one row per shard, so a
+    sweep that crashes can resume after the last committed batch.
+    """
+
+    __tablename__ = "deadline_sweep_cursors"
+    shard = Column(String, primary_key=True)  # "<shard_index>/<shard_count>"
+    phase = Column(String, nullable=False)  # "lists" or "items"
+    last_deadline = Column(DateTime(timezone=False), nullable=True)
+    last_id = Column(PGUUID(as_uuid=True), nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+    )
@@ -0,0 +1,130 @@
+import math
+import threading
+import time
+import numpy as np
+from uuid import UUID
+from sqlalchemy.orm import Session
+
+from .models import Store
+from .utils import haversine_distances
+
+# Size of one grid cell in degrees of latitude (~550 m). Longitude cells are
+# the same size in degrees; queries widen the longitude span by 1/cos(lat).
+CELL_SIZE_DEG = 0.005
+METERS_PER_DEG_LAT = 111320.0
+
+
+class StoreSpatialIndex:
+    """
+    Uniform lat/lon grid over the `stores` table.
+
+    Each store is bucketed into one cell, so a proximity query only looks at the
+    handful of cells covering the search radius instead of every store.
+
+    Stores are only written outside this API, so the grid isn't patched per
+    change. Instead sync() rebuilds it from the whole table on a background
+    schedule (see refresh_store_index); at 1M stores that is a few seconds
+    every STORE_INDEX_REFRESH_SECONDS, off the request path.
+    """
+
+    def __init__(self, cell_size_deg: float = CELL_SIZE_DEG):
+        self.cell_size_deg = cell_size_deg
+        self._cells: dict[tuple[int, int], dict[UUID, tuple]] = {}
+        self._stores: dict[UUID, tuple] = {}  # store_id → (name, lat, lon)
+        self._lock = threading.Lock()
+        self.last_sync: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return (
+            math.floor(lat / self.cell_size_deg),
+            math.floor(lon / self.cell_size_deg),
+        )
+
+    def sync(self, rows: list[tuple]):
+        """
+        Replace the index contents with (store_id, name, lat, lon) rows.
+
+        The new grid is built without holding the lock and swapped in at the
+        end, so queries keep running against the old grid during a rebuild.
+        """
+        cells: dict[tuple[int, int], dict[UUID, tuple]] = {}
+        stores: dict[UUID, tuple] = {}
+        for store_id, name, lat, lon in rows:
+            cell = self._cell(lat, lon)
+            cells.setdefault(cell, {})[store_id] = (name, lat, lon)
+            stores[store_id] = (name, lat, lon)
+        with self._lock:
+            self._cells, self._stores = cells, stores
+            self.last_sync = time.monotonic()
+
+    def candidates(self, lat: float, lon: float, radius_m: float) -> list[tuple]:
+        """
+        Return (store_id, name, lat, lon) for every store in the cells that
+        overlap the bounding box of the search circle.
+        """
+        dlat = radius_m / METERS_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlon = min(dlat / cos_lat, 180.0)
+
+        min_i, min_j = self._cell(lat - dlat, lon - dlon)
+        max_i, max_j = self._cell(lat + dlat, lon + dlon)
+
+        out = []
+        with self._lock:
+            for i in range(min_i, max_i + 1):
+                for j in range(min_j, max_j + 1):
+                    bucket = self._cells.get((i, j))
+                    if bucket:
+                        out.extend(
+                            (store_id, *store) for store_id, store in bucket.items()
+                        )
+        return out
+
+    def within(self, lat: float, lon: float, radius_m: float) -> list[tuple]:
+        """Return (store_id, name, lat, lon) for stores within radius_m meters."""
+        rows = self.candidates(lat, lon, radius_m)
+        if not rows:
+            return []
+        coords = np.array([(row[2], row[3]) for row in rows], dtype=float)
+        dists = haversine_distances(lat, lon, coords[:, 0], coords[:, 1])
+        return [row for row, dist in zip(rows, dists) if dist <= radius_m]
+
+
+# -------------------- Process-wide index --------------------
+
+# How often the background job re-reads the stores table to pick up changes
+STORE_INDEX_REFRESH_SECONDS = 600
+
+store_index = StoreSpatialIndex()
+_refresh_lock = threading.Lock()
+
+
+def refresh_store_index(db: Session | None = None):
+    """
+    Re-read the stores table into the shared index. Scheduled every
+    STORE_INDEX_REFRESH_SECONDS off the request path (see app/main.py).
+    """
+    if db is None:
+        from .database import SessionLocal
+
+        with SessionLocal() as session:
+            return refresh_store_index(session)
+
+    rows = db.query(Store.store_id, Store.name, Store.latitude, Store.longitude).all()
+    store_index.sync([tuple(r) for r in rows])
+    print(f"[STORE INDEX] Synced {len(rows)} stores")
+
+
+def get_store_index(db: Session) -> StoreSpatialIndex:
+    """
+    Return the shared store index. Only a request that arrives before the
+    first background refresh builds it inline.
+    """
+    if store_index.last_sync is None:
+        with _refresh_lock:
+            if store_index.last_sync is None:
+                refresh_store_index(db)
+    return store_index
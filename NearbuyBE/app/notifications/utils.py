@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -19,3 +20,22 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
     return R * c
+
+
+def haversine_distances(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized haversine_distance over NumPy arrays (decimal degrees).
+    Inputs broadcast against each other, so one point can be compared with
+    arrays of store coordinates, or arrays of pings with arrays of stores.
+    Returns distances in meters.
+    """
+    R = 6371000  # Earth radius in meters
+    φ1 = np.radians(lat1)
+    φ2 = np.radians(lat2)
+    Δφ = φ2 - φ1
+    Δλ = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+
+    a = np.sin(Δφ / 2) ** 2 + np.cos(φ1) * np.cos(φ2) * np.sin(Δλ / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return R * c
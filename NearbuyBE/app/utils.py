@@ -1,6 +1,8 @@
 from supabase_client import supabase
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 from datetime import datetime
+from typing import Optional
+import hashlib
 import socket
 
 
@@ -25,3 +27,58 @@ def bump_list_timestamp(list_id: str):
     except Exception as e:
         print("[ERROR bump_list_timestamp]", e)
         raise HTTPException(status_code=500, detail="Failed to update list timestamp")
+
+
+# ---------------------- Conditional GET ---------------------------------- #
+
+
+def weak_etag(*parts) -> str:
+    """Build a weak ETag from the values a response is derived from."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+def conditional_response(
+    response: Response, if_none_match: Optional[str], etag: str
+) -> Optional[Response]:
+    """
+    Tag the outgoing response with `etag`. If the client already holds that
+    version, return a bodiless 304 for the endpoint to send instead.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if response is not None:
+        response.headers.update(headers)
+    return None
+
+
+def lists_version(user_id: str) -> tuple:
+    """
+    (live list count, newest last_update) for a user. Every list, item and
+    suggestion write bumps lists.last_update and deletes change the count, so
+    this changes whenever any list payload does. It costs one single-row query.
+    """
+    res = (
+        supabase.table("lists")
+        .select("last_update", count="exact")
+        .eq("user_id", user_id)
+        .eq("is_deleted", False)
+        .order("last_update", desc=True)
+        .limit(1)
+        .execute()
+    )
+    newest = res.data[0]["last_update"] if res.data else None
+    return res.count, newest
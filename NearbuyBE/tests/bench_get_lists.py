@@ -0,0 +1,66 @@
+# tests/bench_get_lists.py
+"""
+GET /lists latency as the number of lists grows, against an in-memory
+supabase stand-in that charges a fixed delay per PostgREST round trip.
+
+The per-list variant reproduces the old loop (two extra queries per list) for
+comparison with the batched get_user_lists.
+
+Run from NearbuyBE/: python tests/bench_get_lists.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+import lists.lists as lists_module
+import utils
+from tests.fake_supabase import FakeSupabase
+from tests.test_get_lists import USER_ID, make_tables
+
+ROUND_TRIP = 0.01  # seconds of simulated PostgREST latency per call
+LIST_COUNTS = [1, 10, 40, 100]
+
+
+def per_list_queries(client, user_id):
+    rows = client.table("lists").select("*").eq("user_id", user_id).execute().data
+    for lst in rows:
+        client.table("lists_items").select("*").eq("list_id", lst["list_id"]).eq(
+            "is_deleted", False
+        ).execute()
+        client.table("items_suggestions").select("*").eq("list_id", lst["list_id"]).eq(
+            "used", False
+        ).eq("rejected", False).execute()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print(
+        f"{'lists':>6} {'per-list (ms)':>14} {'calls':>6} {'batched (ms)':>13} {'calls':>6}"
+    )
+    for n in LIST_COUNTS:
+        tables = make_tables(n)
+
+        old = FakeSupabase(tables, latency=ROUND_TRIP)
+        old_s = timed(lambda: per_list_queries(old, USER_ID))
+
+        new = FakeSupabase(tables, latency=ROUND_TRIP)
+        lists_module.supabase = new
+        utils.supabase = new
+        new_s = timed(lambda: lists_module.get_user_lists(USER_ID, token="bench"))
+
+        print(
+            f"{n:>6} {old_s * 1000:>14.1f} {len(old.calls):>6} "
+            f"{new_s * 1000:>13.1f} {len(new.calls):>6}"
+        )
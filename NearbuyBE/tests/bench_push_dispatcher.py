@@ -0,0 +1,81 @@
+# tests/bench_push_dispatcher.py
+"""
+Push throughput against a local mock FCM v1 server: the old one-request-per-push
+path (bare requests.post, new connection each time) versus PushDispatcher's
+pooled client and concurrent batches.
+
+The mock adds a fixed service delay per message to stand in for FCM latency.
+
+Run from NearbuyBE/: python tests/bench_push_dispatcher.py
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+
+from notifications.expo_push import PushDispatcher, _build_payload
+
+MESSAGES = 500
+SERVICE_DELAY = 0.02  # seconds of simulated FCM processing per message
+
+
+class MockFcmHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(SERVICE_DELAY)
+        payload = b'{"name": "projects/bench/messages/1"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def sequential_requests(url, messages):
+    headers = {"Authorization": "Bearer bench"}
+    for msg in messages:
+        requests.post(url, headers=headers, json=_build_payload(*msg))
+
+
+def report(label, n, seconds):
+    print(f"{label:<40} {n:>5} msgs in {seconds:6.2f} s  → {n / seconds:8.1f} msg/s")
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockFcmHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/messages:send"
+
+    messages = [(f"device-{i}", "Title", "Body", {"i": i}) for i in range(MESSAGES)]
+
+    t0 = time.perf_counter()
+    sequential_requests(url, messages)
+    report("sequential requests.post", MESSAGES, time.perf_counter() - t0)
+
+    for concurrency in (1, 8, 32):
+        dispatcher = PushDispatcher(
+            url=url, token_provider=lambda: "bench", max_concurrency=concurrency
+        )
+        t0 = time.perf_counter()
+        results = dispatcher.send_batch(messages)
+        elapsed = time.perf_counter() - t0
+        assert all(results)
+        # h2 is only negotiated over TLS (ALPN); the plain-HTTP mock stays on 1.1
+        report(f"PushDispatcher (concurrency={concurrency})", MESSAGES, elapsed)
+        dispatcher.close()
+
+    server.shutdown()
@@ -0,0 +1,73 @@
+# tests/bench_store_proximity.py
+"""
+Compares the grid-based StoreSpatialIndex against a full scan over every store
+(scalar and NumPy-vectorized) for a 500 m proximity query.
+
+Run from NearbuyBE/: python tests/bench_store_proximity.py
+"""
+
+import os
+import random
+import sys
+import time
+import uuid
+import numpy as np
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+
+from notifications.spatial_index import StoreSpatialIndex
+from notifications.utils import haversine_distance, haversine_distances
+
+RADIUS = 500.0
+QUERIES = 200
+
+
+def full_scan(rows, lat, lon):
+    return [
+        row for row in rows if haversine_distance(lat, lon, row[2], row[3]) <= RADIUS
+    ]
+
+
+def bench(n_stores: int):
+    rng = random.Random(n_stores)
+    # Spread stores over roughly the area of Israel
+    rows = [
+        (uuid.uuid4(), f"store-{i}", rng.uniform(29.5, 33.3), rng.uniform(34.2, 35.9))
+        for i in range(n_stores)
+    ]
+    pings = [(rng.uniform(29.5, 33.3), rng.uniform(34.2, 35.9)) for _ in range(QUERIES)]
+
+    t0 = time.perf_counter()
+    index = StoreSpatialIndex()
+    index.sync(rows)
+    build_s = time.perf_counter() - t0
+
+    # The full scan is far too slow to run every ping at 1M stores
+    scan_queries = pings[: max(1, min(QUERIES, 200_000 // n_stores))]
+    t0 = time.perf_counter()
+    for lat, lon in scan_queries:
+        full_scan(rows, lat, lon)
+    scan_ms = (time.perf_counter() - t0) / len(scan_queries) * 1000
+
+    lats = np.array([row[2] for row in rows])
+    lons = np.array([row[3] for row in rows])
+    t0 = time.perf_counter()
+    for lat, lon in pings:
+        np.flatnonzero(haversine_distances(lat, lon, lats, lons) <= RADIUS)
+    vector_ms = (time.perf_counter() - t0) / len(pings) * 1000
+
+    t0 = time.perf_counter()
+    for lat, lon in pings:
+        index.within(lat, lon, RADIUS)
+    index_ms = (time.perf_counter() - t0) / len(pings) * 1000
+
+    print(
+        f"{n_stores:>9,} stores | build {build_s:7.2f} s | full scan {scan_ms:9.3f} ms/ping"
+        f" | vectorized scan {vector_ms:8.3f} ms/ping | grid index {index_ms:7.3f} ms/ping | speedup x{scan_ms / index_ms:,.0f}"
+    )
+
+
+if __name__ == "__main__":
+    for n in (1_000, 100_000, 1_000_000):
+        bench(n)
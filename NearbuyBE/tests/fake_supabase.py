@@ -0,0 +1,191 @@
+# tests/fake_supabase.py
+"""
+In-memory stand-in for the supabase client, covering the PostgREST query
+builder calls the routers make. Every execute() counts as one round trip and
+can be slowed down with `latency` to mimic network cost.
+"""
+
+import time
+import uuid
+from types import SimpleNamespace
+
+# Generated when an insert leaves them out, like the real column defaults
+PRIMARY_KEYS = {
+    "lists": "list_id",
+    "lists_items": "item_id",
+    "items_suggestions": "suggestion_id",
+    "alerts": "alert_id",
+}
+
+_OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "lt": lambda a, b: a is not None and a < b,
+    "gt": lambda a, b: a is not None and a > b,
+}
+
+
+def _split_top_level(expression):
+    parts, depth, current = [], 0, ""
+    for ch in expression:
+        if ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        current += ch
+    parts.append(current)
+    return parts
+
+
+def _parse_logic(expression, combine):
+    """Parse a PostgREST logic tree such as `a.lt.1,and(a.eq.1,b.lt.2)`."""
+    conditions = []
+    for part in _split_top_level(expression):
+        if part.startswith("and("):
+            conditions.append(_parse_logic(part[4:-1], all))
+            continue
+        column, op, value = part.split(".", 2)
+        value = value.strip('"')
+        conditions.append(lambda r, c=column, o=_OPERATORS[op], v=value: o(r.get(c), v))
+    return lambda r: combine(cond(r) for cond in conditions)
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.ordering = []
+        self.row_limit = None
+        self.is_single = False
+        self.count_mode = None
+        self.update_values = None
+        self.insert_rows = None
+        self.is_delete = False
+
+    # ----- builder -----
+
+    def select(self, *args, count=None, **kwargs):
+        self.count_mode = count
+        return self
+
+    def insert(self, payload):
+        self.insert_rows = payload if isinstance(payload, list) else [payload]
+        return self
+
+    def delete(self):
+        self.is_delete = True
+        return self
+
+    def update(self, values):
+        self.update_values = values
+        return self
+
+    def _value(self, row, key):
+        # "lists.user_id" reads a column of the embedded parent row
+        if "." in key:
+            table, column = key.split(".", 1)
+            fk = table[:-1] + "_id"
+            for parent in self.client.tables.get(table, []):
+                if parent.get(fk) == row.get(fk):
+                    return parent.get(column)
+            return None
+        return row.get(key)
+
+    def eq(self, key, value):
+        self.filters.append(lambda r: self._value(r, key) == value)
+        return self
+
+    def neq(self, key, value):
+        self.filters.append(lambda r: r.get(key) != value)
+        return self
+
+    def gt(self, key, value):
+        self.filters.append(lambda r: r.get(key) is not None and r[key] > value)
+        return self
+
+    def gte(self, key, value):
+        self.filters.append(lambda r: r.get(key) is not None and r[key] >= value)
+        return self
+
+    def lt(self, key, value):
+        self.filters.append(lambda r: r.get(key) is not None and r[key] < value)
+        return self
+
+    def or_(self, expression):
+        self.filters.append(_parse_logic(expression, any))
+        return self
+
+    def in_(self, key, values):
+        values = set(values)
+        self.filters.append(lambda r: r.get(key) in values)
+        return self
+
+    def is_(self, key, value):
+        self.filters.append(lambda r: r.get(key) is None)
+        return self
+
+    def order(self, key, desc=False):
+        self.ordering.append((key, desc))
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    # ----- execution -----
+
+    def execute(self):
+        self.client.calls.append(self.table)
+        if self.client.latency:
+            time.sleep(self.client.latency)
+
+        if self.insert_rows is not None:
+            inserted = []
+            for row in self.insert_rows:
+                row = dict(row)
+                pk = PRIMARY_KEYS.get(self.table)
+                if pk and pk not in row:
+                    row[pk] = str(uuid.uuid4())
+                self.client.tables.setdefault(self.table, []).append(row)
+                inserted.append(dict(row))
+            return SimpleNamespace(data=inserted, count=None)
+
+        rows = [
+            r
+            for r in self.client.tables.setdefault(self.table, [])
+            if all(f(r) for f in self.filters)
+        ]
+        if self.is_delete:
+            table = self.client.tables[self.table]
+            table[:] = [r for r in table if not any(r is d for d in rows)]
+        if self.update_values is not None:
+            for r in rows:
+                r.update(self.update_values)
+        for key, desc in reversed(self.ordering):
+            rows.sort(
+                key=lambda r: (r.get(key) is None, r.get(key) or ""), reverse=desc
+            )
+        count = len(rows) if self.count_mode else None
+        if self.row_limit is not None:
+            rows = rows[: self.row_limit]
+        rows = [dict(r) for r in rows]
+        if self.is_single:
+            return SimpleNamespace(data=rows[0] if rows else None)
+        return SimpleNamespace(data=rows, count=count)
+
+
+class FakeSupabase:
+    def __init__(self, tables=None, latency: float = 0.0):
+        self.tables = tables or {}
+        self.latency = latency
+        self.calls = []
+        self.postgrest = SimpleNamespace(auth=lambda token: None)
+
+    def table(self, name):
+        return FakeQuery(self, name)
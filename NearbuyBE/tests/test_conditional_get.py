@@ -0,0 +1,135 @@
+# tests/test_conditional_get.py
+
+import sys
+import os
+from datetime import datetime
+from types import SimpleNamespace
+import uuid
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+import lists.lists as lists_module
+import alerts_tab.alerts_tab as alerts_module
+import utils
+from utils import etag_matches
+from tests.fake_supabase import FakeSupabase
+from tests.test_get_lists import USER_ID, make_tables
+
+HEADERS = {"token": "t"}
+
+# ----- Fixtures -----
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    tables = make_tables(3)
+    tables["alerts"] = [
+        {
+            "alert_id": str(uuid.uuid4()),
+            "user_id": USER_ID,
+            "store_id": None,
+            "alert_type": "deadline_alert",
+            "last_triggered": "2025-01-01T10:00:00",
+        }
+    ]
+    tables["alerts_items"] = []
+    client = FakeSupabase(tables)
+    client.auth = SimpleNamespace(
+        get_user=lambda: SimpleNamespace(user=SimpleNamespace(id=USER_ID))
+    )
+    for module in (lists_module, alerts_module, utils):
+        monkeypatch.setattr(module, "supabase", client)
+    return client
+
+
+@pytest.fixture
+def http():
+    app = FastAPI()
+    app.include_router(lists_module.router)
+    app.include_router(alerts_module.router)
+    return TestClient(app)
+
+
+def revalidate(http, fake, url):
+    first = http.get(url, headers=HEADERS)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    fake.calls.clear()
+    second = http.get(url, headers={**HEADERS, "If-None-Match": etag})
+    return etag, second
+
+
+# ----- Tests -----
+
+
+def test_etag_matching():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('W/"x", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
+    assert not etag_matches('W/"abd"', 'W/"abc"')
+
+
+def test_user_lists_not_modified_skips_items(http, fake):
+    url = f"/lists?user_id={USER_ID}"
+    etag, res = revalidate(http, fake, url)
+
+    assert res.status_code == 304
+    assert res.content == b""
+    assert res.headers["ETag"] == etag
+    assert fake.calls == ["lists"]
+
+    fake.tables["lists"][1]["last_update"] = datetime.now().isoformat()
+    res = http.get(url, headers={**HEADERS, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+
+
+def test_user_lists_etag_changes_on_delete(http, fake):
+    url = f"/lists?user_id={USER_ID}"
+    etag = http.get(url, headers=HEADERS).headers["ETag"]
+
+    # The deleted list was not the newest one, so only the count moves
+    fake.tables["lists"][0]["is_deleted"] = True
+    res = http.get(url, headers={**HEADERS, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert len(res.json()["lists"]) == 2
+
+
+def test_single_list_not_modified(http, fake):
+    list_id = fake.tables["lists"][0]["list_id"]
+    _, res = revalidate(http, fake, f"/lists/{list_id}")
+
+    assert res.status_code == 304
+    assert fake.calls == ["lists"]
+
+
+def test_alerts_tab_not_modified_until_new_alert(http, fake):
+    etag, res = revalidate(http, fake, "/alerts_tab")
+    assert res.status_code == 304
+    assert "alerts_items" not in fake.calls
+
+    fake.tables["alerts"].append(
+        {
+            "alert_id": str(uuid.uuid4()),
+            "user_id": USER_ID,
+            "store_id": None,
+            "alert_type": "deadline_alert",
+            "last_triggered": "2025-01-02T10:00:00",
+        }
+    )
+    res = http.get("/alerts_tab", headers={**HEADERS, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert len(res.json()) == 2
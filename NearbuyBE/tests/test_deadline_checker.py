@@ -0,0 +1,300 @@
+# tests/test_deadline_checker.py
+
+import sys
+import os
+from datetime import datetime, timedelta
+import uuid
+import zlib
+import pytest
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import notifications.deadline_checker as deadline_checker
+from notifications.models import (
+    Base,
+    User,
+    List,
+    ListItem,
+    DeviceToken,
+    Alert,
+    AlertsItems,
+    DeadlineSweepCursor,
+)
+
+# ----- Fixtures -----
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(monkeypatch, engine):
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+
+    def _get_db():
+        yield session
+
+    monkeypatch.setattr(deadline_checker, "get_db", _get_db)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def pushes(monkeypatch):
+    sent = []
+    monkeypatch.setattr(deadline_checker, "send_expo_push_batch", sent.extend)
+    return sent
+
+
+class StatementLog(list):
+    def listener(self, conn, cursor, statement, *args):
+        self.append(statement)
+
+
+def count_statements(engine):
+    statements = StatementLog()
+    event.listen(engine, "before_cursor_execute", statements.listener)
+    return statements
+
+
+# ----- Seed helpers -----
+
+
+def seed_user_with_list(db, list_deadline, item_deadlines):
+    user = User(user_id=uuid.uuid4())
+    lst = List(
+        list_id=uuid.uuid4(),
+        user_id=user.user_id,
+        name="To Do",
+        deadline=list_deadline,
+        deadline_notified=False,
+    )
+    db.add_all([user, lst])
+    db.flush()
+    items = [
+        ListItem(
+            item_id=uuid.uuid4(),
+            list_id=lst.list_id,
+            name=f"task {i}",
+            deadline=deadline,
+            deadline_notified=False,
+        )
+        for i, deadline in enumerate(item_deadlines)
+    ]
+    db.add_all(items)
+    db.add(DeviceToken(user_id=user.user_id, expo_push_token=f"token-{user.user_id}"))
+    db.commit()
+    return user, lst, items
+
+
+# ----- Tests -----
+
+
+def test_list_and_item_alerts_are_written(db_session, pushes):
+    due = datetime.now() + timedelta(hours=12)
+    user, lst, (item,) = seed_user_with_list(
+        db_session, due, [due - timedelta(hours=1)]
+    )
+
+    deadline_checker.check_deadlines_and_notify()
+
+    alerts = db_session.query(Alert).filter_by(user_id=user.user_id).all()
+    assert len(alerts) == 2
+    assert {a.list_id for a in alerts} == {lst.list_id, None}
+
+    item_links = db_session.query(AlertsItems).filter_by(item_id=item.item_id).all()
+    assert len(item_links) == 1
+
+    assert db_session.get(List, lst.list_id).deadline_notified
+    assert db_session.get(ListItem, item.item_id).deadline_notified
+    assert sorted(title for _, title, _, _ in pushes) == [
+        "Item Deadline Approaching",
+        "List Deadline Approaching",
+    ]
+
+
+def test_items_sharing_list_deadline_link_to_list_alert(db_session, pushes):
+    due = datetime.now() + timedelta(hours=6)
+    user, lst, items = seed_user_with_list(db_session, due, [due, due])
+
+    deadline_checker.check_deadlines_and_notify()
+
+    alert = db_session.query(Alert).filter_by(user_id=user.user_id).one()
+    assert alert.list_id == lst.list_id
+    links = db_session.query(AlertsItems).filter_by(alert_id=alert.alert_id).all()
+    assert {link.item_id for link in links} == {item.item_id for item in items}
+    assert len(pushes) == 1
+
+    # a second sweep finds nothing left to notify
+    pushes.clear()
+    deadline_checker.check_deadlines_and_notify()
+    assert db_session.query(Alert).count() == 1
+    assert pushes == []
+
+
+def sweep_statement_count(engine, db_session, users):
+    due = datetime.now() + timedelta(hours=3)
+    for _ in range(users):
+        seed_user_with_list(db_session, due, [due - timedelta(minutes=30)])
+    statements = count_statements(engine)
+    deadline_checker.check_deadlines_and_notify()
+    event.remove(engine, "before_cursor_execute", statements.listener)
+    return len(statements)
+
+
+def test_sweep_statement_count_does_not_grow_with_rows(engine, db_session, pushes):
+    few = sweep_statement_count(engine, db_session, 5)
+    many = sweep_statement_count(engine, db_session, 50)
+
+    assert db_session.query(Alert).count() == 110
+    assert len(pushes) == 110
+    assert many == few
+
+
+def test_sweep_pages_through_rows_in_batches(db_session, pushes):
+    due = datetime.now() + timedelta(hours=3)
+    for _ in range(30):
+        seed_user_with_list(db_session, due, [due - timedelta(minutes=30)])
+
+    deadline_checker.check_deadlines_and_notify(batch_size=7)
+
+    assert db_session.query(Alert).count() == 60
+    assert db_session.query(List).filter_by(deadline_notified=False).count() == 0
+    assert db_session.query(ListItem).filter_by(deadline_notified=False).count() == 0
+    # finished sweeps leave no cursor behind
+    assert db_session.query(DeadlineSweepCursor).count() == 0
+
+
+def test_sweep_resumes_after_persisted_cursor(db_session, pushes):
+    due = datetime.now() + timedelta(hours=3)
+    lists = [seed_user_with_list(db_session, due, [])[1] for _ in range(6)]
+    lists.sort(key=lambda lst: lst.list_id.hex)
+
+    # a crashed run had committed everything up to the third list
+    for lst in lists[:3]:
+        lst.deadline_notified = True
+    db_session.add(
+        DeadlineSweepCursor(
+            shard="0/1",
+            phase="lists",
+            last_deadline=due,
+            last_id=lists[2].list_id,
+        )
+    )
+    # ...and this list was moved to an earlier deadline while it was down
+    _, moved, _ = seed_user_with_list(db_session, due - timedelta(hours=1), [])
+    db_session.commit()
+
+    deadline_checker.check_deadlines_and_notify()
+
+    notified = {
+        lst.list_id for lst in db_session.query(List).filter_by(deadline_notified=True)
+    }
+    assert notified == {lst.list_id for lst in lists} | {moved.list_id}
+    # rows the crashed run committed are not alerted twice
+    alerted = {a.list_id for a in db_session.query(Alert)}
+    assert alerted == {lst.list_id for lst in lists[3:]} | {moved.list_id}
+    assert db_session.query(Alert).count() == 4
+    assert db_session.query(DeadlineSweepCursor).count() == 0
+
+
+def test_sweep_resumed_in_items_phase_still_covers_lists(db_session, pushes):
+    due = datetime.now() + timedelta(hours=3)
+    _, lst, items = seed_user_with_list(db_session, due, [due - timedelta(hours=1)])
+    db_session.add(
+        DeadlineSweepCursor(
+            shard="0/1",
+            phase="items",
+            last_deadline=items[0].deadline,
+            last_id=items[0].item_id,
+        )
+    )
+    db_session.commit()
+
+    deadline_checker.check_deadlines_and_notify()
+
+    db_session.expire_all()
+    assert db_session.get(List, lst.list_id).deadline_notified is True
+    assert db_session.get(ListItem, items[0].item_id).deadline_notified is True
+    assert db_session.query(DeadlineSweepCursor).count() == 0
+
+
+def test_shards_split_users_without_overlap(engine, db_session, pushes):
+    # Postgres' hashtext() stand-in on the shared in-memory connection
+    engine.raw_connection().driver_connection.create_function(
+        "hashtext", 1, lambda v: zlib.crc32(v.encode())
+    )
+    due = datetime.now() + timedelta(hours=3)
+    for _ in range(20):
+        seed_user_with_list(db_session, due, [due - timedelta(minutes=5)])
+
+    per_shard = []
+    for shard in range(3):
+        before = db_session.query(Alert).count()
+        deadline_checker.check_deadlines_and_notify(shard, 3)
+        per_shard.append(db_session.query(Alert).count() - before)
+
+    assert sum(per_shard) == 40
+    assert sum(1 for n in per_shard if n) > 1
+    assert db_session.query(Alert).count() == 40
+
+
+def test_sweep_skips_when_shard_is_locked(db_session, pushes):
+    due = datetime.now() + timedelta(hours=3)
+    seed_user_with_list(db_session, due, [])
+
+    with deadline_checker._sweep_lock(db_session, "0/1") as acquired:
+        assert acquired
+        assert deadline_checker.check_deadlines_and_notify() is False
+        assert db_session.query(Alert).count() == 0
+
+    assert deadline_checker.check_deadlines_and_notify() is True
+    assert db_session.query(Alert).count() == 1
+
+
+def test_overlapping_sweeps_do_not_alert_twice(engine, db_session, pushes):
+    engine.raw_connection().driver_connection.create_function(
+        "hashtext", 1, lambda v: zlib.crc32(v.encode())
+    )
+    due = datetime.now() + timedelta(hours=3)
+    for _ in range(4):
+        seed_user_with_list(db_session, due, [due, due - timedelta(hours=1)])
+
+    # a CLI shard run plans its pages...
+    now = datetime.now()
+    window_end = now + timedelta(hours=24)
+    list_units, _ = deadline_checker.plan_list_page(
+        db_session, now, window_end, (0, 1), None, 100
+    )
+    item_units, _ = deadline_checker.plan_item_page(
+        db_session, now, window_end, (0, 1), None, 100
+    )
+    assert len(list_units) == 4 and len(item_units) == 4
+
+    # ...while the scheduled sweep (a different lock key) notifies everything
+    assert deadline_checker.check_deadlines_and_notify(0, 2) is True
+    assert deadline_checker.check_deadlines_and_notify() is True
+    assert db_session.query(Alert).count() == 8
+
+    # the stale plan claims nothing and writes nothing
+    assert deadline_checker.write_alert_batch(db_session, list_units + item_units) == []
+    db_session.commit()
+    assert db_session.query(Alert).count() == 8
+    assert db_session.query(AlertsItems).count() == 8
+    assert len(pushes) == 8
@@ -0,0 +1,197 @@
+# tests/test_deadline_scheduler.py
+
+import sys
+import os
+from datetime import datetime, timedelta
+import uuid
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from notifications.deadline_scheduler import (
+    DeadlineScheduler,
+    NOTIFY_LEAD,
+    SWEEP_RETRY_SECONDS,
+)
+from notifications.models import Base, User, List, ListItem
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+# ----- Fixtures -----
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(NOW)
+
+
+@pytest.fixture
+def sweeps():
+    return []
+
+
+@pytest.fixture
+def scheduler(clock, sweeps):
+    def sweep():
+        sweeps.append(clock())
+        return True
+
+    return DeadlineScheduler(sweep=sweep, clock=clock)
+
+
+# ----- Tests -----
+
+
+def test_fires_once_deadline_enters_window(scheduler, clock, sweeps):
+    deadline = NOW + timedelta(hours=30)
+    scheduler.schedule_list(uuid.uuid4(), deadline)
+
+    assert scheduler.seconds_until_next() == pytest.approx(6 * 3600)
+    assert scheduler.run_pending() == 0
+
+    clock.now = deadline - NOTIFY_LEAD
+    assert scheduler.run_pending() == 1
+    assert sweeps == [clock.now]
+    assert len(scheduler) == 0
+    assert scheduler.run_pending() == 0
+
+
+def test_due_entries_share_one_sweep(scheduler, clock, sweeps):
+    for hours in (25, 26, 27):
+        scheduler.schedule_item(uuid.uuid4(), NOW + timedelta(hours=hours))
+
+    clock.now = NOW + timedelta(hours=2, minutes=30)
+    assert scheduler.run_pending() == 2
+    assert len(sweeps) == 1
+    assert len(scheduler) == 1
+
+
+def test_moved_deadline_skips_stale_entry(scheduler, clock, sweeps):
+    item_id = uuid.uuid4()
+    scheduler.schedule_item(item_id, NOW + timedelta(hours=25))
+    scheduler.schedule_item(str(item_id), (NOW + timedelta(hours=48)).isoformat())
+
+    clock.now = NOW + timedelta(hours=2)
+    assert scheduler.run_pending() == 0
+    assert sweeps == []
+
+    clock.now = NOW + timedelta(hours=24)
+    assert scheduler.run_pending() == 1
+
+
+def test_cleared_deadline_never_fires(scheduler, clock, sweeps):
+    list_id = uuid.uuid4()
+    scheduler.schedule_list(list_id, NOW + timedelta(hours=25))
+    scheduler.schedule_list(list_id, None)
+
+    clock.now = NOW + timedelta(days=3)
+    assert scheduler.run_pending() == 0
+    assert sweeps == []
+
+
+def test_skipped_sweep_retries_its_deadlines(clock):
+    # another worker holds the shard lock the first time
+    outcomes = [False, True]
+    scheduler = DeadlineScheduler(sweep=lambda: outcomes.pop(0), clock=clock)
+    scheduler.schedule_list(uuid.uuid4(), NOW + timedelta(hours=25))
+
+    clock.now = NOW + timedelta(hours=1)
+    assert scheduler.run_pending() == 1
+    assert len(scheduler) == 1
+    assert scheduler.seconds_until_next() == pytest.approx(SWEEP_RETRY_SECONDS)
+
+    clock.now += timedelta(seconds=SWEEP_RETRY_SECONDS)
+    assert scheduler.run_pending() == 1
+    assert outcomes == []
+    assert len(scheduler) == 0
+
+
+def test_failed_sweep_retries_its_deadlines(clock):
+    calls = []
+
+    def sweep():
+        calls.append(clock())
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        return True
+
+    scheduler = DeadlineScheduler(sweep=sweep, clock=clock)
+    item_id = uuid.uuid4()
+    scheduler.schedule_item(item_id, NOW + timedelta(hours=25))
+
+    clock.now = NOW + timedelta(hours=1)
+    assert scheduler.run_pending() == 1
+    assert len(scheduler) == 1
+
+    clock.now += timedelta(seconds=SWEEP_RETRY_SECONDS)
+    assert scheduler.run_pending() == 1
+    assert len(calls) == 2
+    assert len(scheduler) == 0
+
+
+def test_load_reads_unnotified_future_deadlines(scheduler):
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    user = User(user_id=uuid.uuid4())
+    upcoming = List(
+        list_id=uuid.uuid4(),
+        user_id=user.user_id,
+        name="Upcoming",
+        deadline=NOW + timedelta(days=2),
+        deadline_notified=False,
+    )
+    notified = List(
+        list_id=uuid.uuid4(),
+        user_id=user.user_id,
+        name="Notified",
+        deadline=NOW + timedelta(days=2),
+        deadline_notified=True,
+    )
+    past = List(
+        list_id=uuid.uuid4(),
+        user_id=user.user_id,
+        name="Past",
+        deadline=NOW - timedelta(days=1),
+        deadline_notified=False,
+    )
+    db.add_all([user, upcoming, notified, past])
+    db.flush()
+    db.add(
+        ListItem(
+            item_id=uuid.uuid4(),
+            list_id=upcoming.list_id,
+            name="task",
+            deadline=NOW + timedelta(hours=10),
+            deadline_notified=False,
+        )
+    )
+    db.commit()
+
+    scheduler.load(db)
+    assert len(scheduler) == 2
+    # The item is already inside the 24 h window, so it is due right away
+    assert scheduler.seconds_until_next() < 0
+
+    db.close()
+    engine.dispose()
@@ -0,0 +1,164 @@
+# tests/test_expo_push.py
+
+import sys
+import os
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+
+import notifications.expo_push as expo_push
+
+
+class FakeCredentials:
+    loads = 0
+    refreshes = 0
+
+    def __init__(self, lifetime):
+        self.lifetime = lifetime
+        self.token = None
+        self.expiry = None
+
+    def refresh(self, request):
+        FakeCredentials.refreshes += 1
+        time.sleep(0.05)  # simulate the round trip to Google's token endpoint
+        self.token = f"token-{FakeCredentials.refreshes}"
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.expiry = now + self.lifetime
+
+
+def make_cache(monkeypatch, lifetime=timedelta(hours=1)):
+    FakeCredentials.loads = 0
+    FakeCredentials.refreshes = 0
+
+    def from_file(path, scopes):
+        FakeCredentials.loads += 1
+        return FakeCredentials(lifetime)
+
+    monkeypatch.setattr(
+        expo_push.service_account.Credentials, "from_service_account_file", from_file
+    )
+    return expo_push._FcmTokenCache("sa.json", ["scope"])
+
+
+def test_token_is_minted_once_for_many_concurrent_senders(monkeypatch):
+    cache = make_cache(monkeypatch)
+    tokens = []
+
+    threads = [
+        threading.Thread(target=lambda: tokens.append(cache.get())) for _ in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert set(tokens) == {"token-1"}
+    assert FakeCredentials.loads == 1
+    assert FakeCredentials.refreshes == 1
+
+
+def test_token_is_refreshed_shortly_before_expiry(monkeypatch):
+    # a token that expires within the refresh margin is treated as stale
+    cache = make_cache(monkeypatch, lifetime=timedelta(minutes=4))
+
+    assert cache.get() == "token-1"
+    assert cache.get() == "token-2"
+    assert FakeCredentials.loads == 1
+
+
+def test_invalidate_forces_new_token(monkeypatch):
+    cache = make_cache(monkeypatch)
+
+    assert cache.get() == "token-1"
+    assert cache.get() == "token-1"
+    cache.invalidate()
+    assert cache.get() == "token-2"
+
+
+# ----- PushDispatcher against a local mock FCM server -----
+
+
+class MockFcmHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    # token → statuses to return before succeeding
+    script = {}
+    received = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        token = body["message"]["token"]
+        with self.lock:
+            self.received.append((token, self.headers["Authorization"]))
+            queued = self.script.get(token) or []
+            status = queued.pop(0) if queued else 200
+        payload = b'{"name": "projects/test/messages/1"}'
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fcm_server():
+    MockFcmHandler.script = {}
+    MockFcmHandler.received = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockFcmHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/messages:send"
+    server.shutdown()
+    server.server_close()
+
+
+def make_dispatcher(url):
+    return expo_push.PushDispatcher(
+        url=url, token_provider=lambda: "cached", max_concurrency=4, backoff_base=0.01
+    )
+
+
+def test_send_batch_delivers_every_message_in_order(fcm_server):
+    dispatcher = make_dispatcher(fcm_server)
+    messages = [(f"device-{i}", "Title", "Body", {"i": i}) for i in range(25)]
+
+    results = dispatcher.send_batch(messages)
+
+    assert results == [True] * 25
+    assert sorted(t for t, _ in MockFcmHandler.received) == sorted(
+        m[0] for m in messages
+    )
+    assert {auth for _, auth in MockFcmHandler.received} == {"Bearer cached"}
+    dispatcher.close()
+
+
+def test_send_retries_rate_limits_and_server_errors(fcm_server):
+    MockFcmHandler.script = {"flaky": [429, 503], "bad": [400], "down": [500] * 10}
+    dispatcher = make_dispatcher(fcm_server)
+
+    results = dispatcher.send_batch(
+        [
+            ("flaky", "T", "B", None),
+            ("bad", "T", "B", None),
+            ("down", "T", "B", None),
+        ]
+    )
+
+    assert results == [True, False, False]
+    tokens = [t for t, _ in MockFcmHandler.received]
+    assert tokens.count("flaky") == 3
+    assert tokens.count("bad") == 1  # client errors are not retried
+    assert tokens.count("down") == dispatcher.max_retries + 1
+    dispatcher.close()
@@ -0,0 +1,159 @@
+# tests/test_fetch_recommendations.py
+
+import sys
+import os
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+import lists.lists as lists_module
+import utils
+from tests.fake_supabase import FakeSupabase
+
+ML_DELAY = 0.2  # seconds per simulated model call
+LIST_ID = "L1"
+
+# ----- Mock ML service -----
+
+
+class MockMlHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    in_flight = 0
+    peak = 0
+    batch_calls = 0
+    batch_supported = True
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        time.sleep(ML_DELAY)
+        with cls.lock:
+            cls.in_flight -= 1
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/recommend_similar_products":
+            name = query["product_name"][0]
+            if name == "broken":
+                self.send_error(500)
+                return
+            body = {"similar_products": [f"{name} refill"]}
+        else:
+            body = {"recommended_products": [f"{query['list_name'][0]} basics"]}
+        self._send_json(body)
+
+    def do_POST(self):
+        cls = type(self)
+        cls.batch_calls += 1
+        if not cls.batch_supported:
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(ML_DELAY)
+        results = [
+            {"product_name": name, "similar_products": [f"{name} refill"]}
+            for name in body["product_names"]
+        ]
+        self._send_json({"results": results})
+
+    def _send_json(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ml_server(monkeypatch):
+    MockMlHandler.peak = 0
+    MockMlHandler.batch_calls = 0
+    MockMlHandler.batch_supported = True
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockMlHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("ML_API_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    def _install(item_names):
+        client = FakeSupabase(
+            {
+                "lists": [{"list_id": LIST_ID, "last_update": None}],
+                "lists_items": [
+                    {"list_id": LIST_ID, "name": name, "is_deleted": False}
+                    for name in item_names
+                ],
+                "items_suggestions": [],
+            }
+        )
+        monkeypatch.setattr(lists_module, "supabase", client)
+        monkeypatch.setattr(utils, "supabase", client)
+        return client
+
+    return _install
+
+
+# ----- Tests -----
+
+
+def test_items_share_one_batch_call(ml_server, fake):
+    names = [f"item {i}" for i in range(50)]
+    client = fake(names)
+
+    start = time.perf_counter()
+    lists_module.fetch_and_store_recommendations("party", LIST_ID)
+    elapsed = time.perf_counter() - start
+
+    # The batch call and the by-name call overlap: about one round trip
+    assert MockMlHandler.batch_calls == 1
+    assert elapsed < 2 * ML_DELAY + 0.3
+    stored = {s["name"] for s in client.tables["items_suggestions"]}
+    assert stored == {f"{n} refill" for n in names} | {"party basics"}
+
+
+def test_falls_back_to_parallel_item_calls(ml_server, fake):
+    MockMlHandler.batch_supported = False
+    names = [f"item {i}" for i in range(lists_module.ML_MAX_PARALLEL)]
+    client = fake(names)
+
+    start = time.perf_counter()
+    lists_module.fetch_and_store_recommendations("party", LIST_ID)
+    elapsed = time.perf_counter() - start
+
+    # Nine calls (eight items + list name) on eight workers: two rounds, not nine
+    assert elapsed < 3 * ML_DELAY + 0.3
+    assert MockMlHandler.peak == lists_module.ML_MAX_PARALLEL
+    stored = {s["name"] for s in client.tables["items_suggestions"]}
+    assert stored == {f"{n} refill" for n in names} | {"party basics"}
+
+
+def test_failed_item_call_keeps_the_rest(ml_server, fake):
+    MockMlHandler.batch_supported = False
+    client = fake(["milk", "broken"])
+
+    lists_module.fetch_and_store_recommendations("groceries", LIST_ID)
+
+    stored = {s["name"] for s in client.tables["items_suggestions"]}
+    assert stored == {"milk refill", "groceries basics"}
@@ -0,0 +1,176 @@
+# tests/test_get_lists.py
+
+import sys
+import os
+from datetime import datetime, timedelta
+import uuid
+import pytest
+from fastapi import HTTPException
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+import lists.lists as lists_module
+import utils
+from tests.fake_supabase import FakeSupabase
+
+USER_ID = str(uuid.uuid4())
+
+
+def make_tables(n_lists, items_per_list=3):
+    tables = {"lists": [], "lists_items": [], "items_suggestions": []}
+    for i in range(n_lists):
+        list_id = str(uuid.uuid4())
+        tables["lists"].append(
+            {
+                "list_id": list_id,
+                "user_id": USER_ID,
+                "name": f"list {i}",
+                "deadline": None,
+                "geo_alert": False,
+                "is_deleted": False,
+                "last_update": f"2025-01-01T00:00:{i:02d}",
+            }
+        )
+        for j in range(items_per_list):
+            tables["lists_items"].append(
+                {
+                    "item_id": str(uuid.uuid4()),
+                    "list_id": list_id,
+                    "name": f"item {j}",
+                    "is_checked": j == 0,
+                    "is_deleted": False,
+                    "geo_alert": False,
+                }
+            )
+        tables["items_suggestions"].append(
+            {
+                "suggestion_id": str(uuid.uuid4()),
+                "list_id": list_id,
+                "name": "suggested",
+                "used": False,
+                "rejected": False,
+            }
+        )
+    return tables
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    def _install(tables):
+        client = FakeSupabase(tables)
+        monkeypatch.setattr(lists_module, "supabase", client)
+        monkeypatch.setattr(utils, "supabase", client)
+        return client
+
+    return _install
+
+
+@pytest.mark.parametrize("n_lists", [1, 40])
+def test_round_trips_do_not_grow_with_list_count(fake, n_lists):
+    client = fake(make_tables(n_lists))
+
+    res = lists_module.get_user_lists(USER_ID, token="t")
+
+    assert len(res["lists"]) == n_lists
+    # list version (for the ETag), lists, then one batched query each
+    assert client.calls == ["lists", "lists", "lists_items", "items_suggestions"]
+
+
+def test_items_and_suggestions_grouped_per_list(fake):
+    tables = make_tables(2)
+    tables["lists_items"][0]["is_deleted"] = True
+    tables["items_suggestions"][1]["rejected"] = True
+    tables["lists_items"][4]["geo_alert"] = True
+    fake(tables)
+
+    res = lists_module.get_user_lists(USER_ID, token="t")
+
+    by_id = {lst["id"]: lst for lst in res["lists"]}
+    first, second = (by_id[lst["list_id"]] for lst in tables["lists"])
+    assert [it["name"] for it in first["items"]] == ["item 1", "item 2"]
+    assert first["unchecked_count"] == 2
+    assert len(first["suggested_items"]) == 1
+    assert second["suggested_items"] == []
+    assert {it["list_id"] for it in second["items"]} == {second["id"]}
+    assert res["any_geo_enabled"] is True
+
+
+def test_keyset_pages_cover_every_list_once(fake):
+    tables = make_tables(7)
+    # Two lists updated at the same instant must still page deterministically
+    tables["lists"][3]["last_update"] = tables["lists"][4]["last_update"]
+    fake(tables)
+
+    seen, cursor = [], None
+    while True:
+        page = lists_module.get_user_lists(USER_ID, token="t", limit=3, cursor=cursor)
+        assert len(page["lists"]) <= 3
+        seen.extend(lst["id"] for lst in page["lists"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    expected = sorted(
+        tables["lists"], key=lambda r: (r["last_update"], r["list_id"]), reverse=True
+    )
+    assert seen == [r["list_id"] for r in expected]
+
+
+def test_delta_sync_returns_changes_and_tombstones(fake):
+    tables = make_tables(4)
+    client = fake(tables)
+    since = datetime.now().isoformat()
+
+    changed, deleted = tables["lists"][0], tables["lists"][1]
+    later = (datetime.now() + timedelta(seconds=1)).isoformat()
+    changed["last_update"] = later
+    gone_item = next(
+        i for i in tables["lists_items"] if i["list_id"] == changed["list_id"]
+    )
+    gone_item.update(is_deleted=True, deleted_at=later)
+    deleted.update(is_deleted=True, deleted_at=later)
+    client.calls.clear()
+
+    res = lists_module.get_user_lists(USER_ID, token="t", since=since)
+
+    assert [lst["id"] for lst in res["lists"]] == [changed["list_id"]]
+    assert len(res["lists"][0]["items"]) == 2
+    assert res["deleted_list_ids"] == [deleted["list_id"]]
+    assert [it["item_id"] for it in res["deleted_items"]] == [gone_item["item_id"]]
+    assert res["full_resync"] is False
+
+
+def test_write_committed_after_read_is_in_next_delta(fake):
+    tables = make_tables(2)
+    fake(tables)
+    first = lists_module.get_user_lists(USER_ID, token="t")
+
+    # stamped by another replica just before that read, committed just after
+    late = tables["lists"][0]
+    late["last_update"] = (datetime.now() - timedelta(seconds=1)).isoformat()
+
+    res = lists_module.get_user_lists(USER_ID, token="t", since=first["sync_token"])
+    assert [lst["id"] for lst in res["lists"]] == [late["list_id"]]
+
+
+def test_stale_watermark_falls_back_to_full_sync(fake):
+    fake(make_tables(3))
+    since = (datetime.now() - timedelta(days=60)).isoformat()
+
+    res = lists_module.get_user_lists(USER_ID, token="t", since=since)
+
+    assert res["full_resync"] is True
+    assert len(res["lists"]) == 3
+    assert "deleted_list_ids" not in res
+
+
+def test_rejects_malformed_cursor(fake):
+    fake(make_tables(1))
+    with pytest.raises(HTTPException) as exc:
+        lists_module.get_user_lists(USER_ID, token="t", limit=1, cursor="garbage")
+    assert exc.value.status_code == 400
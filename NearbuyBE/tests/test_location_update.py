@@ -0,0 +1,288 @@
+# tests/test_location_update.py
+
+import sys
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import threading
+import uuid
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+import notifications.main as notifications_main
+import notifications.availability_jobs as availability_jobs
+from notifications.models import (
+    Base,
+    User,
+    List,
+    ListItem,
+    Store,
+    DeviceToken,
+    UserStoreProximity,
+    StoreItemAvailability,
+    Alert,
+    AlertsItems,
+)
+from notifications.spatial_index import StoreSpatialIndex
+
+# ----- Fixtures -----
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def pushes(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        notifications_main,
+        "send_expo_push_batch",
+        lambda messages: sent.extend(m[:3] for m in messages),
+    )
+    return sent
+
+
+@pytest.fixture
+def client(monkeypatch, db_session):
+    def _get_db():
+        yield db_session
+
+    monkeypatch.setattr(notifications_main, "get_db", _get_db)
+    index = StoreSpatialIndex()
+    monkeypatch.setattr(
+        notifications_main, "get_store_index", lambda db: _sync_index(index, db)
+    )
+    monkeypatch.setattr(notifications_main.supabase.postgrest, "auth", lambda t: None)
+
+    app = FastAPI()
+    app.include_router(notifications_main.router)
+    return TestClient(app)
+
+
+def _sync_index(index, db):
+    rows = db.query(Store.store_id, Store.name, Store.latitude, Store.longitude)
+    index.sync([tuple(r) for r in rows])
+    return index
+
+
+def login(monkeypatch, user_id):
+    user = SimpleNamespace(user=SimpleNamespace(id=user_id))
+    monkeypatch.setattr(notifications_main.supabase.auth, "get_user", lambda: user)
+
+
+# ----- Seed helpers -----
+
+
+def seed_user_near_store(db, item_names, cached):
+    """User with geo-alert items who has been next to a store for 3 minutes."""
+    user = User(user_id=uuid.uuid4())
+    lst = List(list_id=uuid.uuid4(), user_id=user.user_id, name="Groceries")
+    store = Store(
+        store_id=uuid.uuid4(), name="CornerStore", latitude=32.0, longitude=34.8
+    )
+    db.add_all([user, lst, store])
+    db.flush()
+
+    items = [
+        ListItem(item_id=uuid.uuid4(), list_id=lst.list_id, name=n, geo_alert=True)
+        for n in item_names
+    ]
+    db.add_all(items)
+    db.add(DeviceToken(user_id=user.user_id, expo_push_token="dummy-token"))
+    db.add(
+        UserStoreProximity(
+            user_id=user.user_id,
+            store_id=store.store_id,
+            entered_at=datetime.now() - timedelta(minutes=3),
+            notified=False,
+        )
+    )
+    for name, prediction in cached.items():
+        db.add(
+            StoreItemAvailability(
+                store_id=store.store_id,
+                last_run=datetime.now(),
+                prediction=prediction,
+                confidence=0.9,
+                reason="cached",
+                item_name=name,
+            )
+        )
+    db.commit()
+    return user, items, store
+
+
+def post_location(client, store):
+    return client.post(
+        "/location_update",
+        json={
+            "latitude": store.latitude,
+            "longitude": store.longitude,
+            "timestamp": datetime.now().isoformat(),
+        },
+        headers={"token": "jwt"},
+    )
+
+
+# ----- Tests -----
+
+
+def test_get_availability_for_pairs_reports_missing(db_session):
+    _, _, store = seed_user_near_store(
+        db_session, ["Milk", "Eggs", "Bread"], {"Milk": True, "Eggs": False}
+    )
+    other_store = uuid.uuid4()
+    pairs = [
+        (store.store_id, "Milk"),
+        (store.store_id, "Eggs"),
+        (store.store_id, "Bread"),
+        (other_store, "Milk"),
+    ]
+
+    found, missing = notifications_main.get_availability_for_pairs(db_session, pairs)
+
+    assert set(found) == {(store.store_id, "Milk"), (store.store_id, "Eggs")}
+    assert missing == {store.store_id: ["Bread"], other_store: ["Milk"]}
+
+
+def test_cached_availability_triggers_alert_and_push(
+    monkeypatch, db_session, client, pushes
+):
+    user, items, store = seed_user_near_store(
+        db_session, ["Milk", "Eggs"], {"Milk": True, "Eggs": False}
+    )
+    login(monkeypatch, user.user_id)
+
+    resp = post_location(client, store)
+    assert resp.status_code == 200
+
+    alerts = db_session.query(Alert).filter_by(user_id=user.user_id).all()
+    assert len(alerts) == 1
+    links = db_session.query(AlertsItems).filter_by(alert_id=alerts[0].alert_id)
+    assert [link.item_id for link in links] == [items[0].item_id]
+    assert len(pushes) == 1
+    assert "Milk" in pushes[0][2]
+
+    prox = db_session.query(UserStoreProximity).filter_by(user_id=user.user_id).one()
+    assert prox.notified
+
+
+def test_missing_availability_is_resolved_in_background(
+    monkeypatch, db_session, client, pushes
+):
+    user, _, store = seed_user_near_store(db_session, ["Milk", "Eggs"], {"Milk": False})
+    login(monkeypatch, user.user_id)
+    asked = []
+    release = threading.Event()
+
+    def fake_agent(product, store_name):
+        asked.append((product, store_name))
+        release.wait(5)
+        return {"answer": True, "confidence": 0.8, "reason": "agent"}
+
+    monkeypatch.setattr(availability_jobs, "check_availability_with_agent", fake_agent)
+    queue = availability_jobs.AvailabilityJobQueue(max_concurrency=2)
+    monkeypatch.setattr(notifications_main, "availability_queue", queue)
+
+    # the ping returns while the agent is still running
+    resp = post_location(client, store)
+    assert resp.status_code == 200
+    assert pushes == []
+
+    # a second ping while the job is pending does not queue the agent again
+    resp = post_location(client, store)
+    assert resp.status_code == 200
+
+    release.set()
+    queue.join(timeout=5)
+
+    assert asked == [("Eggs", "CornerStore")]
+    rec = (
+        db_session.query(StoreItemAvailability)
+        .filter_by(store_id=store.store_id, item_name="Eggs")
+        .one()
+    )
+    assert rec.prediction
+    assert len(pushes) == 1
+    assert "Eggs" in pushes[0][2]
+    prox = db_session.query(UserStoreProximity).filter_by(user_id=user.user_id).one()
+    assert prox.notified
+
+
+def test_leaving_store_clears_proximity(monkeypatch, db_session, client, pushes):
+    user, _, store = seed_user_near_store(db_session, ["Milk"], {"Milk": False})
+    login(monkeypatch, user.user_id)
+
+    resp = client.post(
+        "/location_update",
+        json={
+            "latitude": store.latitude + 0.1,
+            "longitude": store.longitude,
+            "timestamp": datetime.now().isoformat(),
+        },
+        headers={"token": "jwt"},
+    )
+    assert resp.status_code == 200
+    assert db_session.query(UserStoreProximity).count() == 0
+
+
+def test_groups_sharing_a_pair_finish_without_a_waiting_thread(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def fake_agent(product, store_name):
+        calls.append(product)
+        release.wait(5)
+        return {"answer": product == "Milk"}
+
+    monkeypatch.setattr(availability_jobs, "check_availability_with_agent", fake_agent)
+    queue = availability_jobs.AvailabilityJobQueue(max_concurrency=2)
+    store_id = uuid.uuid4()
+    names = {store_id: "CornerStore"}
+    done = {}
+
+    queue.submit("a", [(store_id, "Milk")], names, lambda r: done.update(a=r))
+    queue.submit(
+        "b", [(store_id, "Milk"), (store_id, "Eggs")], names, lambda r: done.update(b=r)
+    )
+    assert queue.is_pending("a") and queue.is_pending("b")
+
+    release.set()
+    queue.join(timeout=5)
+    queue.shutdown()
+
+    assert sorted(calls) == ["Eggs", "Milk"]
+    assert done["a"] == {(store_id, "Milk"): {"answer": True}}
+    assert done["b"] == {
+        (store_id, "Milk"): {"answer": True},
+        (store_id, "Eggs"): {"answer": False},
+    }
+    assert not queue.is_pending("a") and not queue.is_pending("b")
+    assert not any(
+        t.name.startswith("availability-done") for t in threading.enumerate()
+    )
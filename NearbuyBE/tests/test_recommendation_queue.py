@@ -0,0 +1,86 @@
+# tests/test_recommendation_queue.py
+
+import sys
+import os
+import threading
+import time
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+import lists.lists as lists_module
+import utils
+from lists.models import UserList
+from lists.recommendation_queue import RecommendationQueue
+from tests.fake_supabase import FakeSupabase
+
+
+class BlockingJob:
+    """Records calls and holds each one until released."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, list_name, list_id):
+        self.calls.append((list_id, list_name))
+        self.started.set()
+        assert self.release.wait(5)
+
+
+def test_duplicate_submits_collapse_into_one_rerun():
+    job = BlockingJob()
+    queue = RecommendationQueue(job, max_workers=2)
+
+    assert queue.submit("L1", "groceries")
+    assert job.started.wait(5)
+    assert not queue.submit("L1", "groceries v2")
+    assert not queue.submit("L1", "groceries v3")
+    job.release.set()
+    queue.join(timeout=5)
+
+    assert job.calls == [("L1", "groceries"), ("L1", "groceries v3")]
+    assert not queue.is_pending("L1")
+    queue.shutdown()
+
+
+def test_failed_job_releases_list():
+    def failing(list_name, list_id):
+        raise RuntimeError("ML service down")
+
+    queue = RecommendationQueue(failing, max_workers=1)
+    queue.submit("L1", "groceries")
+    queue.join(timeout=5)
+
+    assert not queue.is_pending("L1")
+    assert queue.submit("L1", "groceries")
+    queue.join(timeout=5)
+    queue.shutdown()
+
+
+def test_create_list_returns_before_recommendations(monkeypatch):
+    client = FakeSupabase({"lists": []})
+    monkeypatch.setattr(lists_module, "supabase", client)
+    monkeypatch.setattr(utils, "supabase", client)
+
+    job = BlockingJob()
+    queue = RecommendationQueue(job, max_workers=1)
+    monkeypatch.setattr(lists_module, "recommendation_queue", queue)
+    monkeypatch.setattr(lists_module, "get_profile_geo", lambda user_id: False)
+
+    start = time.perf_counter()
+    res = lists_module.create_list(UserList(name="groceries"), "u1", token="t")
+    assert time.perf_counter() - start < 1
+    list_id = res["list_id"]
+    assert [lst["list_id"] for lst in client.tables["lists"]] == [list_id]
+
+    assert job.started.wait(5)
+    assert job.calls == [(list_id, "groceries")]
+    job.release.set()
+    queue.join(timeout=5)
+    queue.shutdown()
@@ -0,0 +1,111 @@
+# tests/test_spatial_index.py
+
+import sys
+import os
+import random
+import uuid
+import numpy as np
+
+# ensure project root is on PYTHONPATH so imports resolve
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), "app"))  # allow imports from app/
+
+import notifications.spatial_index as spatial_index
+from notifications.spatial_index import StoreSpatialIndex
+from notifications.utils import haversine_distance, haversine_distances
+
+
+def random_stores(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        (uuid.uuid4(), f"store-{i}", rng.uniform(31.9, 32.2), rng.uniform(34.7, 35.0))
+        for i in range(n)
+    ]
+
+
+def full_scan(rows, lat, lon, radius):
+    return {
+        row[0] for row in rows if haversine_distance(lat, lon, row[2], row[3]) <= radius
+    }
+
+
+def test_within_matches_full_scan():
+    rows = random_stores(5000)
+    index = StoreSpatialIndex()
+    index.sync(rows)
+
+    rng = random.Random(1)
+    for _ in range(50):
+        lat, lon = rng.uniform(31.9, 32.2), rng.uniform(34.7, 35.0)
+        found = {row[0] for row in index.within(lat, lon, 500.0)}
+        assert found == full_scan(rows, lat, lon, 500.0)
+
+
+def test_sync_applies_moves_and_removals():
+    store_id = uuid.uuid4()
+    index = StoreSpatialIndex()
+    index.sync([(store_id, "CornerStore", 32.0, 34.8)])
+    assert [r[0] for r in index.within(32.0, 34.8, 500.0)] == [store_id]
+
+    # store moved ~10 km north
+    index.sync([(store_id, "CornerStore", 32.1, 34.8)])
+    assert index.within(32.0, 34.8, 500.0) == []
+    assert [r[0] for r in index.within(32.1, 34.8, 500.0)] == [store_id]
+
+    index.sync([])
+    assert len(index) == 0
+    assert index.within(32.1, 34.8, 500.0) == []
+
+
+class FakeStoreQuery:
+    def __init__(self, db):
+        self.db = db
+
+    def all(self):
+        self.db.queries += 1
+        return list(self.db.rows)
+
+
+class FakeStoreDb:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def query(self, *columns):
+        return FakeStoreQuery(self)
+
+
+def test_store_index_is_built_once_then_refreshed_off_request_path(monkeypatch):
+    monkeypatch.setattr(spatial_index, "store_index", StoreSpatialIndex())
+    store_id = uuid.uuid4()
+    db = FakeStoreDb([(store_id, "CornerStore", 32.0, 34.8)])
+
+    # first ping builds the index; later pings never re-read the table
+    for _ in range(3):
+        index = spatial_index.get_store_index(db)
+    assert db.queries == 1
+    assert [r[0] for r in index.within(32.0, 34.8, 500.0)] == [store_id]
+
+    # the background job swaps in the new grid
+    db.rows = [(store_id, "CornerStore", 32.1, 34.8)]
+    spatial_index.refresh_store_index(db)
+    assert spatial_index.get_store_index(db) is index
+    assert index.within(32.0, 34.8, 500.0) == []
+    assert [r[0] for r in index.within(32.1, 34.8, 500.0)] == [store_id]
+
+
+def test_vectorized_haversine_matches_scalar():
+    rows = random_stores(200)
+    lats = np.array([row[2] for row in rows])
+    lons = np.array([row[3] for row in rows])
+
+    dists = haversine_distances(32.0, 34.8, lats, lons)
+    expected = [haversine_distance(32.0, 34.8, row[2], row[3]) for row in rows]
+    np.testing.assert_allclose(dists, expected, rtol=1e-9)
+
+    # many pings against many stores broadcast to a (pings, stores) matrix
+    ping_lats = np.array([32.0, 32.1])[:, None]
+    ping_lons = np.array([34.8, 34.9])[:, None]
+    matrix = haversine_distances(ping_lats, ping_lons, lats, lons)
+    assert matrix.shape == (2, len(rows))
+    np.testing.assert_allclose(matrix[0], expected, rtol=1e-9)
@@ -1,5 +1,10 @@
 from fastapi import FastAPI, HTTPException
-from ml_component.clustering.products_recommender import ProductRecommender
+from pydantic import BaseModel
+from typing import List, Optional
+from ml_component.clustering.model_registry import (
+    get_product_recommender,
+    memory_report,
+)
 from ml_component.clustering.list_based_recommender import ListBasedRecommender
 from ml_component.locations_based_recommender_agent.product_availability_agent import (
     ProductAvailabilityAgent,
@@ -8,10 +13,14 @@ from ml_component.locations_based_recommender_agent.product_availability_agent i
 app = FastAPI()
 
 # Global instances
-product_recommender = ProductRecommender()
+# Shared with ListBasedRecommender through the model registry
+product_recommender = get_product_recommender()
 list_recommender = ListBasedRecommender()
 availability_agent = ProductAvailabilityAgent()
 
+# Largest number of product names accepted by one batch request
+MAX_BATCH_SIZE = 256
+
 """
 To set up the server run: uvicorn ml_component.api.model_fastapi_server:app --reload
 You need to be pwd on the same hierarchy as ml_component 
@@ -58,6 +67,37 @@ def recommend_similar_products(product_name: str, top_k: int = 5):
     }
 
 
+class SimilarProductsBatchRequest(BaseModel):
+    product_names: List[str]
+    top_k: int = 5
+
+
+@app.post("/recommend_similar_products/batch")
+def recommend_similar_products_batch(req: SimilarProductsBatchRequest):
+    """
+    /recommend_similar_products for many products in one call. All names are
+    encoded in one batched forward pass and scored with one matrix multiply.
+    """
+    if product_recommender is None:
+        raise HTTPException(
+            status_code=400, detail="ProductRecommender not initialized"
+        )
+    if len(req.product_names) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_SIZE} product names per request",
+        )
+    similar = product_recommender.find_similar_products_batch(
+        req.product_names, req.top_k
+    )
+    return {
+        "results": [
+            {"product_name": name, "similar_products": products}
+            for name, products in zip(req.product_names, similar)
+        ]
+    }
+
+
 @app.get("/recommend_by_list_name")
 def recommend_by_list_name(list_name: str):
     if list_recommender is None:
@@ -82,13 +122,40 @@ def recommend_top_lists(list_name: str):
     }
 
 
+@app.get("/memory_report")
+def get_memory_report():
+    """
+    Resident memory of every loaded embedding model and catalog index.
+    """
+    return memory_report()
+
+
+@app.get("/availability_cache_stats")
+def get_availability_cache_stats():
+    """
+    Hit, miss and eviction counters of this worker's availability result cache.
+    """
+    return availability_agent.cache.stats()
+
+
 @app.get("/check_product_availability")
-def check_product_availability(product: str, store: str):
+def check_product_availability(
+    product: str, store: str, category: Optional[str] = None
+):
     """
     Runs the full agent pipeline and returns whether the product is likely sold in the given store.
+    Without a category, the product's top predicted category is used.
     """
     try:
-        result = availability_agent.check_product(product, store)
+        if category is None:
+            category = product_recommender.predict_top_categories(product, top_k=1)[0]
+        result = availability_agent.check_product(product, store, category)
         return {"product": product, "store": store, **result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.on_event("shutdown")
+def save_availability_cache():
+    # Snapshot the result index so the next start warm-loads it
+    availability_agent.cache.save()
@@ -0,0 +1,98 @@
+"""
+Recall-vs-latency benchmark for the EmbeddingSearchEngine index backends.
+
+Uses synthetic clustered unit vectors (real catalog embeddings are strongly
+clustered by category) so it runs without the transformer or Supabase.
+Recall@k is measured against the exact backend.
+
+Run from the repo root:
+    python -m ml_component.clustering.bench_index_backends
+    python -m ml_component.clustering.bench_index_backends --sizes 10000 100000 1000000 --dim 768
+"""
+
+import argparse
+import time
+import numpy as np
+
+from ml_component.clustering.index_backends import make_index
+
+# backend → list of parameter settings to sweep
+SWEEPS = {
+    "exact": [{}],
+    "ivf": [{"nprobe": 4}, {"nprobe": 16}, {"nprobe": 64}],
+    "hnsw": [{"ef_search": 32}, {"ef_search": 64}, {"ef_search": 256}],
+    "ivfpq": [{"nprobe": 16}, {"nprobe": 64}],
+}
+
+
+def synthetic_catalog(n: int, dim: int, n_clusters: int = 200, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        stop = min(start + 100_000, n)
+        labels = rng.integers(0, n_clusters, stop - start)
+        noise = rng.standard_normal((stop - start, dim)).astype(np.float32)
+        out[start:stop] = centers[labels] + 0.6 * noise
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+
+def make_queries(catalog: np.ndarray, n: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    picks = catalog[rng.integers(0, len(catalog), n)]
+    queries = picks + 0.3 * rng.standard_normal(picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(t) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def run(sizes, dim, n_queries, k, backends):
+    print(
+        f"{'products':>9} {'backend':<7} {'params':<18} {'build s':>8} "
+        f"{'ms/query':>9} {'recall@' + str(k):>9}"
+    )
+    for n in sizes:
+        catalog = synthetic_catalog(n, dim)
+        queries = make_queries(catalog, n_queries)
+
+        exact = make_index("exact")
+        exact.build(catalog)
+        _, truth = exact.search(queries, k)
+
+        for kind in backends:
+            for params in SWEEPS[kind]:
+                index = make_index(kind, **params)
+                try:
+                    start = time.perf_counter()
+                    index.build(catalog)
+                    build_s = time.perf_counter() - start
+                except ImportError:
+                    print(f"{n:>9} {kind:<7} (faiss not installed)", flush=True)
+                    break
+
+                # Queries are sent one at a time, as the API serves them
+                start = time.perf_counter()
+                found = np.vstack([index.search(q[None, :], k)[1] for q in queries])
+                ms = (time.perf_counter() - start) * 1000 / n_queries
+
+                label = ",".join(f"{key}={v}" for key, v in params.items()) or "-"
+                print(
+                    f"{n:>9} {kind:<7} {label:<18} {build_s:>8.2f} "
+                    f"{ms:>9.3f} {recall_at_k(truth, found):>9.3f}",
+                    flush=True,
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--backends", nargs="+", default=list(SWEEPS))
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.queries, args.k, args.backends)
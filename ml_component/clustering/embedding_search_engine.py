@@ -1,26 +1,168 @@
+import hashlib
+import json
+import os
 import numpy as np
-from typing import List
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Optional
+from ml_component.clustering.model_registry import get_sentence_transformer
+from ml_component.clustering.index_backends import make_index
+
+# Backend used for large indexes: exact, ivf, hnsw or ivfpq (see index_backends)
+DEFAULT_INDEX_BACKEND = os.getenv("EMBEDDING_INDEX_BACKEND", "exact")
+# Below this many items an exact scan is both faster and exact
+ANN_MIN_ITEMS = 10_000
 
 
 class EmbeddingSearchEngine:
-    def __init__(self, model_name: str = "all-mpnet-base-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str = "all-mpnet-base-v2",
+        index_backend: Optional[str] = None,
+        **index_params,
+    ):
+        self.model_name = model_name
+        # Shared with every other engine/cache using the same model
+        self.model = get_sentence_transformer(model_name)
+        self.index_backend = index_backend or DEFAULT_INDEX_BACKEND
+        self.index_params = index_params
         self.index_items: List[str] = []
         self.embeddings: np.ndarray = None
+        self.search_index = None
+
+    def build_index(self, items: List[str], cache_dir: Optional[str] = None):
+        """
+        Embed `items` as the search index. With a cache_dir the embeddings are
+        kept on disk, and only items missing from the last saved index get
+        encoded.
+        """
+        if cache_dir is None:
+            # Unit-length rows, so cosine similarity is a plain dot product
+            embeddings = self.encode_batch(items)
+        else:
+            embeddings = self._load_or_encode(items, cache_dir)
+        self.set_index(items, embeddings)
+
+    def set_index(self, items: List[str], embeddings: np.ndarray):
+        """Index already-encoded, unit-length rows (one per item)."""
+        kind = self.index_backend if len(items) >= ANN_MIN_ITEMS else "exact"
+        params = self.index_params if kind == self.index_backend else {}
+        search_index = make_index(kind, **params)
+        search_index.build(embeddings)
+        self.index_items, self.embeddings = items, embeddings
+        self.search_index = search_index
+
+    # ---------- on-disk embedding cache ----------
+
+    def _cache_stem(self) -> str:
+        return f"embeddings_{self.model_name.replace('/', '_')}"
+
+    def _manifest_path(self, cache_dir: str) -> str:
+        return os.path.join(cache_dir, f"{self._cache_stem()}.json")
+
+    def _content_hash(self, items: List[str]) -> str:
+        digest = hashlib.sha256(self.model_name.encode())
+        for item in items:
+            digest.update(b"\0" + item.encode())
+        return digest.hexdigest()
+
+    def _load_or_encode(self, items: List[str], cache_dir: str) -> np.ndarray:
+        """
+        The cache is a float32 .npy matrix named after the content hash of
+        its items, plus a JSON manifest listing those items row by row. A
+        matching hash means the file is memory-mapped as is. Otherwise the
+        rows of items that are still present are reused, the rest are
+        encoded, and a new version is written and mapped.
 
-    def build_index(self, items: List[str]):
-        self.index_items = items
-        self.embeddings = self.model.encode(items, convert_to_numpy=True)
+        The returned array is the read-only mapping itself, stored in the
+        dtype the search runs in, so worker processes share its pages
+        instead of each holding a private copy.
+        """
+        manifest_path = self._manifest_path(cache_dir)
+        content_hash = self._content_hash(items)
+
+        manifest, cached = {"items": []}, None
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            cached = np.load(os.path.join(cache_dir, manifest["matrix"]), mmap_mode="r")
+            # Older caches were float16; those are rewritten below
+            if manifest["hash"] == content_hash and cached.dtype == np.float32:
+                print(f"[EMBEDDINGS] Loaded {len(items)} cached embeddings")
+                return cached
+        except (OSError, ValueError, KeyError):
+            manifest, cached = {"items": []}, None
+
+        row_of = {item: i for i, item in enumerate(manifest["items"])}
+        missing = sorted({item for item in items if item not in row_of})
+        print(
+            f"[EMBEDDINGS] Reusing {len(items) - len(missing)} embeddings, "
+            f"encoding {len(missing)} new items"
+        )
+        fresh = dict(zip(missing, self.encode_batch(missing))) if missing else {}
+        embeddings = np.stack(
+            [fresh[item] if item in fresh else cached[row_of[item]] for item in items]
+        ).astype(np.float32)
+
+        matrix_path = self._save(cache_dir, embeddings, items, content_hash, manifest)
+        return np.load(matrix_path, mmap_mode="r")
+
+    def _save(self, cache_dir, embeddings, items, content_hash, old_manifest):
+        # The manifest is swapped in last, so readers only ever see a complete
+        # matrix that matches it
+        matrix_name = f"{self._cache_stem()}_{content_hash[:16]}.npy"
+        matrix_path = os.path.join(cache_dir, matrix_name)
+        manifest_path = self._manifest_path(cache_dir)
+        # Per-process temp names: workers starting together may all rebuild
+        tmp_matrix = f"{matrix_path}.{os.getpid()}.tmp.npy"
+        tmp_manifest = f"{manifest_path}.{os.getpid()}.tmp"
+        np.save(tmp_matrix, embeddings)
+        os.replace(tmp_matrix, matrix_path)
+        with open(tmp_manifest, "w") as f:
+            json.dump(
+                {
+                    "model": self.model_name,
+                    "hash": content_hash,
+                    "matrix": matrix_name,
+                    "items": items,
+                },
+                f,
+            )
+        os.replace(tmp_manifest, manifest_path)
+
+        old_matrix = old_manifest.get("matrix")
+        if old_matrix and old_matrix != matrix_name:
+            try:
+                os.remove(os.path.join(cache_dir, old_matrix))
+            except OSError:
+                pass
+        return matrix_path
 
     def encode_single(self, item: str) -> np.ndarray:
         return self.model.encode([item], convert_to_numpy=True)
 
+    def encode_batch(self, items: List[str]) -> np.ndarray:
+        return self.model.encode(
+            items, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+
     def find_top_k(self, query: str, k: int = 5) -> List[str]:
-        if not self.index_items or self.embeddings is None:
+        return self.find_top_k_batch([query], k)[0]
+
+    def find_top_k_batch(self, queries: List[str], k: int = 5) -> List[List[str]]:
+        """
+        Top-k index items for every query: one batched encode, then one
+        search of the index backend for the whole batch.
+        """
+        ids = self.find_top_k_ids_batch(queries, k)
+        return [[self.index_items[i] for i in row if i >= 0] for row in ids]
+
+    def find_top_k_ids_batch(self, queries: List[str], k: int = 5) -> np.ndarray:
+        """
+        Like find_top_k_batch, but returns the (n_queries, k) array of index
+        positions, best first. Positions may be padded with -1.
+        """
+        if not self.index_items or self.search_index is None:
             raise ValueError("Index not built. Call build_index() first.")
-        query_vec = self.encode_single(query)
-        scores = cosine_similarity(query_vec, self.embeddings)[0]
-        top_k_idx = np.argsort(scores)[::-1][:k]
-        return [self.index_items[i] for i in top_k_idx]
+        if not queries:
+            return np.empty((0, k), dtype=np.int64)
+        _, ids = self.search_index.search(self.encode_batch(queries), k)
+        return ids
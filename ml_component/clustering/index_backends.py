@@ -0,0 +1,145 @@
+"""
+Nearest-neighbour backends for EmbeddingSearchEngine.
+
+All backends take unit-length float32 rows and rank by inner product, which
+for normalised vectors is cosine similarity. `search` returns (scores, ids)
+arrays of shape (n_queries, k); ANN backends may pad ids with -1 when fewer
+than k neighbours were found.
+
+    exact  brute-force matmul + argpartition (default, no extra dependency)
+    ivf    FAISS inverted file over k-means cells (IndexIVFFlat)
+    hnsw   FAISS navigable small-world graph (IndexHNSWFlat)
+    ivfpq  FAISS inverted file with product-quantised codes (IndexIVFPQ)
+"""
+
+import math
+import numpy as np
+from typing import Tuple
+
+
+def _faiss():
+    # faiss is only needed for the ANN backends
+    import faiss
+
+    return faiss
+
+
+class ExactIndex:
+    def __init__(self):
+        self.embeddings: np.ndarray = None
+
+    def build(self, embeddings: np.ndarray):
+        # A float32 memory map is searched in place, not copied
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = queries @ self.embeddings.T
+        k = min(k, scores.shape[1])
+        # Partial sort: only the k best columns of each row get ordered
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return (
+            np.take_along_axis(top_scores, order, axis=1),
+            np.take_along_axis(top, order, axis=1),
+        )
+
+
+class _FaissIndex:
+    def __init__(self):
+        self.index = None
+
+    def _make(self, faiss, dim: int, n: int):
+        raise NotImplementedError
+
+    def build(self, embeddings: np.ndarray):
+        faiss = _faiss()
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.index = self._make(faiss, embeddings.shape[1], len(embeddings))
+        if not self.index.is_trained:
+            self.index.train(embeddings)
+        self.index.add(embeddings)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        return self.index.search(queries, min(k, self.index.ntotal))
+
+
+def _default_nlist(n: int) -> int:
+    # ~4·sqrt(n) cells, and at least 39 training points per cell
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+class IVFIndex(_FaissIndex):
+    def __init__(self, nlist: int = None, nprobe: int = 16):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+    def _make(self, faiss, dim, n):
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(
+            quantizer, dim, self.nlist or _default_nlist(n), faiss.METRIC_INNER_PRODUCT
+        )
+        index.nprobe = self.nprobe
+        self._quantizer = quantizer  # the IVF index does not own it
+        return index
+
+
+class HNSWIndex(_FaissIndex):
+    def __init__(self, m: int = 32, ef_construction: int = 200, ef_search: int = 64):
+        super().__init__()
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+
+    def _make(self, faiss, dim, n):
+        index = faiss.IndexHNSWFlat(dim, self.m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = self.ef_construction
+        index.hnsw.efSearch = self.ef_search
+        return index
+
+
+class IVFPQIndex(_FaissIndex):
+    def __init__(
+        self, nlist: int = None, nprobe: int = 16, code_size: int = 48, nbits: int = 8
+    ):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.code_size = code_size  # bytes per vector (sub-quantisers)
+        self.nbits = nbits
+
+    def _make(self, faiss, dim, n):
+        # The vector must split evenly into sub-quantisers
+        m = self.code_size
+        while dim % m:
+            m -= 1
+        quantizer = faiss.IndexFlatIP(dim)
+        nlist = self.nlist or _default_nlist(n)
+        # PQ training needs 2^nbits points per codebook
+        nbits = min(self.nbits, max(1, int(math.log2(max(n, 2))) - 1))
+        index = faiss.IndexIVFPQ(
+            quantizer, dim, nlist, m, nbits, faiss.METRIC_INNER_PRODUCT
+        )
+        index.nprobe = self.nprobe
+        self._quantizer = quantizer
+        return index
+
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+    "hnsw": HNSWIndex,
+    "ivfpq": IVFPQIndex,
+}
+
+
+def make_index(kind: str = "exact", **params):
+    try:
+        backend = INDEX_BACKENDS[kind]
+    except KeyError:
+        raise ValueError(
+            f"Unknown index backend '{kind}', expected one of {list(INDEX_BACKENDS)}"
+        )
+    return backend(**params)
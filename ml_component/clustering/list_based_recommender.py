@@ -1,8 +1,85 @@
-from typing import List
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional
 from collections import Counter
 from ml_component.clustering.embedding_search_engine import EmbeddingSearchEngine
 from ml_component.globals import *
-from ml_component.clustering.products_recommender import ProductRecommender
+from ml_component.clustering.model_registry import get_product_recommender
+
+# How often the list-name index asks Supabase for new or renamed lists
+LIST_INDEX_REFRESH_SECONDS = 60
+# How often it re-reads every list, to drop lists that were hard-deleted
+LIST_INDEX_FULL_SYNC_SECONDS = 3600
+
+
+class ListNameIndex:
+    """
+    List rows keyed by list_id, searchable by name.
+
+    Each distinct name is encoded once and its embedding kept, so new and
+    renamed lists only cost encoding their new names, and a search only
+    encodes the query. Watermarks on `last_update` drive incremental updates.
+    """
+
+    def __init__(self, engine: EmbeddingSearchEngine):
+        self.engine = engine
+        self.lists: Dict[str, dict] = {}  # list_id → row
+        self.watermark: Optional[str] = None  # newest last_update seen
+        self._name_vectors: Dict[str, np.ndarray] = {}
+        self._dirty = True
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.lists)
+
+    def apply(self, rows: List[dict]):
+        """Add new lists and update changed ones."""
+        with self._lock:
+            for row in rows:
+                if "name" not in row:
+                    continue
+                old = self.lists.get(row["list_id"])
+                self.lists[row["list_id"]] = row
+                if old is None or old["name"] != row["name"]:
+                    self._dirty = True
+                stamp = row.get("last_update")
+                if stamp and (self.watermark is None or stamp > self.watermark):
+                    self.watermark = stamp
+
+            new_names = list(
+                {r["name"] for r in rows if "name" in r} - self._name_vectors.keys()
+            )
+            if new_names:
+                vectors = self.engine.encode_batch(new_names)
+                self._name_vectors.update(zip(new_names, vectors))
+
+    def replace_all(self, rows: List[dict]):
+        """Swap in a full snapshot of the table, keeping cached embeddings."""
+        with self._lock:
+            self.lists = {}
+            self.watermark = None
+            self._dirty = True
+            self.apply(rows)
+            # Forget embeddings of names no list uses any more
+            live = {row["name"] for row in self.lists.values()}
+            self._name_vectors = {
+                name: vec for name, vec in self._name_vectors.items() if name in live
+            }
+
+    def search(self, query: str, k: int) -> List[dict]:
+        """Rows of every list whose name is among the k names closest to query."""
+        with self._lock:
+            if not self.lists:
+                return []
+            if self._dirty:
+                names = sorted({row["name"] for row in self.lists.values()})
+                self.engine.set_index(
+                    names, np.stack([self._name_vectors[name] for name in names])
+                )
+                self._dirty = False
+            similar_names = set(self.engine.find_top_k(query, k=k))
+            return [row for row in self.lists.values() if row["name"] in similar_names]
 
 
 class ListBasedRecommender:
@@ -21,7 +98,7 @@ class ListBasedRecommender:
         :param final_m: Number of products to return in the final recommendation
         """
         self.supabase = supabase
-        self.product_recommender = ProductRecommender()
+        self.product_recommender = get_product_recommender()
         self.embedding_model_name = embedding_model_name
         self.k = k
         self.top_k_per_product = top_k_per_product
@@ -30,11 +107,46 @@ class ListBasedRecommender:
         self.list_name_engine = EmbeddingSearchEngine(
             model_name=self.embedding_model_name
         )
+        self.list_index = ListNameIndex(self.list_name_engine)
+        self._last_refresh = 0.0
+        self._last_full_sync = 0.0
+        self._refresh_lock = threading.Lock()
 
     def _get_all_lists(self) -> List[dict]:
         response = self.supabase.table("lists").select("*").execute()
         return response.data if response.data else []
 
+    def _get_lists_updated_since(self, watermark: str) -> List[dict]:
+        # gte, not gt: rows stamped with the same instant may not all have
+        # been visible last time; re-applying a row is harmless
+        response = (
+            self.supabase.table("lists")
+            .select("*")
+            .gte("last_update", watermark)
+            .execute()
+        )
+        return response.data if response.data else []
+
+    def _refresh_list_index(self):
+        now = time.monotonic()
+        if now - self._last_refresh < LIST_INDEX_REFRESH_SECONDS:
+            return
+        with self._refresh_lock:
+            if now - self._last_refresh < LIST_INDEX_REFRESH_SECONDS:
+                return
+            full = (
+                self.list_index.watermark is None
+                or now - self._last_full_sync >= LIST_INDEX_FULL_SYNC_SECONDS
+            )
+            if full:
+                self.list_index.replace_all(self._get_all_lists())
+                self._last_full_sync = now
+            else:
+                self.list_index.apply(
+                    self._get_lists_updated_since(self.list_index.watermark)
+                )
+            self._last_refresh = now
+
     def _get_list_items_names(self, list_id: str) -> List[str]:
         response = (
             self.supabase.table("lists_items")
@@ -52,16 +164,13 @@ class ListBasedRecommender:
         """
         Returns the most similar lists to the input list name.
         """
-        all_lists = self._get_all_lists()
-        list_names = [lst["name"] for lst in all_lists if "name" in lst]
+        self._refresh_list_index()
 
-        if not list_names:
+        if not len(self.list_index):
             print("[WARN] No lists found in Supabase.")
             return []
 
-        self.list_name_engine.build_index(list_names)
-        similar_names = self.list_name_engine.find_top_k(input_list_name, k=self.k)
-        similar_lists = [lst for lst in all_lists if lst["name"] in similar_names]
+        similar_lists = self.list_index.search(input_list_name, k=self.k)
 
         if not similar_lists:
             print(f"[WARN] No similar lists found for input: {input_list_name}")
@@ -81,14 +190,17 @@ class ListBasedRecommender:
             product_names = self._get_list_items_names(lst["list_id"])
             all_product_names.extend(product_names)
 
-        # Step 3: Recommend similar products
+        # Step 3: Recommend similar products, one batched lookup per distinct
+        # name; duplicates still count once per occurrence
+        name_counts = Counter(name for name in all_product_names if name)
+        names = list(name_counts)
         recommendation_counter = Counter()
-        for product_name in all_product_names:
-            if product_name:
-                similar = self.product_recommender.find_similar_products(
-                    product_name, top_k=self.top_k_per_product
-                )
-                recommendation_counter.update(similar)
+        similar_per_name = self.product_recommender.find_similar_products_batch(
+            names, top_k=self.top_k_per_product
+        )
+        for product_name, similar in zip(names, similar_per_name):
+            for product in similar:
+                recommendation_counter[product] += name_counts[product_name]
 
         # Step 4: Return top-m most frequently recommended products
         return [
@@ -0,0 +1,85 @@
+"""
+Process-wide registry of heavy model objects.
+
+Every component asks the registry instead of constructing its own, so each
+SentenceTransformer is loaded once and the catalog embedding index exists
+once, however many recommenders and caches use it.
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+from sentence_transformers import SentenceTransformer
+
+_lock = threading.RLock()
+_transformers: Dict[str, SentenceTransformer] = {}
+_product_recommenders: Dict[Tuple[str, str], "ProductRecommender"] = {}
+
+
+def get_sentence_transformer(model_name: str) -> SentenceTransformer:
+    """Return the shared SentenceTransformer for model_name, loading it once."""
+    with _lock:
+        model = _transformers.get(model_name)
+        if model is None:
+            print(f"[REGISTRY] Loading embedding model: {model_name}")
+            model = SentenceTransformer(model_name)
+            _transformers[model_name] = model
+        return model
+
+
+def get_product_recommender(
+    embedding_model_name: str = "all-mpnet-base-v2", cache_dir: str = "cache"
+):
+    """Return the shared ProductRecommender (catalog, classifier and index)."""
+    # Imported here: products_recommender itself depends on this module
+    from ml_component.clustering.products_recommender import ProductRecommender
+
+    key = (embedding_model_name, cache_dir)
+    with _lock:
+        recommender = _product_recommenders.get(key)
+        if recommender is None:
+            recommender = ProductRecommender(
+                embedding_model_name=embedding_model_name, cache_dir=cache_dir
+            )
+            _product_recommenders[key] = recommender
+        return recommender
+
+
+def _model_bytes(model) -> int:
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def _process_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # ru_maxrss is the peak, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_report() -> dict:
+    """Resident size of every loaded model and catalog index, in MiB."""
+    mib = 1024 * 1024
+    with _lock:
+        models = {
+            name: round(_model_bytes(model) / mib, 1)
+            for name, model in _transformers.items()
+        }
+        indexes = {}
+        for (model_name, cache_dir), recommender in _product_recommenders.items():
+            embeddings = recommender.embedding_engine.embeddings
+            indexes[f"{model_name}@{cache_dir}"] = {
+                "products": len(recommender.embedding_engine.index_items),
+                "mib": (
+                    round(embeddings.nbytes / mib, 1) if embeddings is not None else 0.0
+                ),
+            }
+    return {
+        "models_mib": models,
+        "catalog_indexes": indexes,
+        "process_rss_mib": round(_process_rss_bytes() / mib, 1),
+    }
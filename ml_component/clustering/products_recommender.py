@@ -37,13 +37,32 @@ class ProductRecommender:
 
         # Build global embedding index
         self.embedding_engine = EmbeddingSearchEngine(model_name=embedding_model_name)
-        self.embedding_engine.build_index(self.products_df["product_name"].tolist())
+        self.embedding_engine.build_index(
+            self.products_df["product_name"].tolist(), cache_dir=self.cache_dir
+        )
+
+        # Category of every index row, so candidates are filtered by index
+        # position. A repeated product name takes its first row's category.
+        first_category = self.products_df.drop_duplicates("product_name").set_index(
+            "product_name"
+        )["category_name"]
+        self.index_categories = first_category.reindex(
+            self.embedding_engine.index_items
+        ).to_numpy(dtype=object)
 
     def _load_products_from_supabase(self) -> pd.DataFrame:
         """
         Loads product data from Supabase table 'model_products'.
+        Rows come back in a fixed order, so the embedding cache's content
+        hash only changes when the products do.
         """
-        response = supabase.table("model_products").select("*").execute()
+        response = (
+            supabase.table("model_products")
+            .select("*")
+            .order("product_name")
+            .order("category_name")
+            .execute()
+        )
         data = response.data
         return pd.DataFrame(data)
 
@@ -55,26 +74,42 @@ class ProductRecommender:
         top_indices = np.argsort(probas)[::-1][:top_k]
         return [self.categories[idx] for idx in top_indices]
 
+    def predict_top_categories_batch(self, input_products: list, top_k: int = 2):
+        """
+        predict_top_categories for many products with one classifier call.
+        """
+        probas = self.classifier.predict_proba(input_products)
+        top_indices = np.argsort(probas, axis=1)[:, ::-1][:, :top_k]
+        return [[self.categories[idx] for idx in row] for row in top_indices]
+
     def find_similar_products(self, input_product: str, top_k: int = 5):
         """
         Finds top_k similar products to the given product name, filtered by predicted categories.
         """
-        predicted_categories = set(self.predict_top_categories(input_product, top_k=2))
-
-        candidates = self.embedding_engine.find_top_k(input_product, k=top_k * 5)
+        return self.find_similar_products_batch([input_product], top_k)[0]
 
-        # Filter and deduplicate
-        filtered = []
-        seen = set()
-        for product in candidates:
-            if product in seen:
-                continue
-            seen.add(product)
+    def find_similar_products_batch(self, input_products: list, top_k: int = 5):
+        """
+        find_similar_products for many products at once: the queries are
+        encoded in one pass and scored against the index in one matrix multiply.
+        """
+        if not input_products:
+            return []
+        predicted = np.array(
+            self.predict_top_categories_batch(input_products, top_k=2), dtype=object
+        )
+        ids = self.embedding_engine.find_top_k_ids_batch(input_products, k=top_k * 5)
 
-            row = self.products_df[self.products_df["product_name"] == product]
-            if not row.empty and row.iloc[0]["category_name"] in predicted_categories:
-                filtered.append(product)
-            if len(filtered) == top_k:
-                break
+        # One mask over every (query, candidate) pair: keep candidates whose
+        # category is among the query's predicted ones
+        categories = self.index_categories[ids]
+        keep = (categories[:, :, None] == predicted[:, None, :]).any(axis=2)
+        keep &= ids >= 0
 
-        return filtered
+        items = self.embedding_engine.index_items
+        results = []
+        for row_ids, row_keep in zip(ids, keep):
+            # Deduplicate names, preserving rank order
+            names = dict.fromkeys(items[i] for i in row_ids[row_keep])
+            results.append(list(names)[:top_k])
+        return results
@@ -1,10 +1,16 @@
 from langgraph.graph import END, StateGraph
-from typing import TypedDict, List, Optional, Dict, Tuple
+from typing import TypedDict, List, Optional, Dict
 from langchain_core.runnables import Runnable
 import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import sqlite3
+import threading
+import time
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from ml_component.clustering.model_registry import get_sentence_transformer
+from ml_component.locations_based_recommender_agent.store_cache import CACHE_DIR
 
 from ml_component.locations_based_recommender_agent.tools.find_store_website_tool import (
     FindStoreWebsiteTool,
@@ -21,6 +27,7 @@ from ml_component.locations_based_recommender_agent.tools.summarize_page_tool im
 class AgentState(TypedDict):
     product: str
     store: str
+    category: Optional[str]
     store_url: str
     page_urls: List[str]
     current_index: int
@@ -29,58 +36,388 @@ class AgentState(TypedDict):
 
 
 # === FAISS-backed result cache ===
+
+# How long an availability answer stays valid
+RESULT_TTL_SECONDS = int(os.getenv("AVAILABILITY_TTL_SECONDS", str(7 * 24 * 3600)))
+# Least recently used answers are evicted beyond this many
+MAX_CACHE_ENTRIES = int(os.getenv("AVAILABILITY_CACHE_MAX_ENTRIES", "10000"))
+# The size bound is enforced every this many inserts, making room for as many
+EVICT_EVERY = 50
+# Hits update last_used in memory; the buffer is written out at this many
+# entries or this many seconds, and always before an LRU eviction
+TOUCH_FLUSH_EVERY = 100
+TOUCH_FLUSH_SECONDS = 30
+# Rewrite the on-disk index once this many entries were added since the last one
+SNAPSHOT_EVERY = 200
+# Neighbours fetched per lookup, so entries evicted by another worker can be skipped
+SEARCH_K = 4
+EMBEDDING_DIM = 384
+
+
+def _new_index():
+    # Inner product on unit vectors is cosine similarity; ids are sqlite row ids
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(EMBEDDING_DIM))
+
+
+def _read_index_mmap(path: str):
+    """Memory-map a saved index so worker processes share its pages."""
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
 class ResultCache:
-    def __init__(self):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.index = faiss.IndexFlatL2(384)
-        self.entries: Dict[str, Tuple[str, str]] = {}  # index → (store, product)
-        self.results: Dict[str, Dict] = {}  # "store|product" → result
+    """
+    Availability answers keyed by (store, product), with similar keys reused.
+
+    Results, their key embeddings and expiry times live in SQLite (WAL mode,
+    memory-mapped reads), which every worker process opens. The FAISS index
+    over the embeddings is periodically written next to it with
+    faiss.write_index. On startup a worker maps that snapshot read-only and
+    loads rows newer than it into a small in-memory delta index. Rows that
+    other workers add later are picked up by id on each lookup.
+
+    An exact key match is answered from SQLite without running the model.
+    Entries expire after ttl_seconds. Every evict_every inserts, the least
+    recently used entries are evicted to leave room for the next
+    evict_every under max_entries. Hits record last_used in memory and
+    write it in batches, so a lookup doesn't cost a write transaction. Evicted ids are removed from the delta
+    index; the read-only snapshot skips them with an ID selector until the
+    next save() rebuilds it.
+    """
 
-    def _id(self, store: str, product: str) -> str:
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        ttl_seconds: int = RESULT_TTL_SECONDS,
+        max_entries: int = MAX_CACHE_ENTRIES,
+        evict_every: int = EVICT_EVERY,
+    ):
+        self.model = get_sentence_transformer("all-MiniLM-L6-v2")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = max(1, min(evict_every, max_entries))
+        self._inserts = 0
+        self._touched: Dict[int, float] = {}  # row id → last_used, not yet written
+        self._touch_flushed_at = time.time()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, "results.faiss")
+        self._lock = threading.RLock()
+        # Per-process counters, see stats()
+        self.counters = {
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, "results.sqlite"), check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA mmap_size=268435456")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT UNIQUE NOT NULL,
+                result TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at REAL NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(results)")}
+        for column in ("created_at", "last_used"):
+            if column not in columns:  # cache written before entries were timed
+                self._db.execute(
+                    f"ALTER TABLE results ADD COLUMN {column} REAL NOT NULL DEFAULT 0"
+                )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at)"
+        )
+        self._db.commit()
+        self._warm_load()
+
+    @staticmethod
+    def key(store: str, product: str) -> str:
+        """Normalized "store|product" key the cache and its callers agree on."""
         return f"{store.strip().lower()}|{product.strip().lower()}"
 
-    def add(self, store: str, product: str, result: Dict):
-        key = self._id(store, product)
-        if key in self.results:
-            return
-        embedding = (
+    def _embed(self, key: str) -> np.ndarray:
+        return (
             self.model.encode(key, normalize_embeddings=True)
             .astype(np.float32)
             .reshape(1, -1)
         )
-        self.index.add(embedding)
-        self.entries[str(len(self.entries))] = (store, product)
-        self.results[key] = result
+
+    # ---------- loading ----------
+
+    def _warm_load(self):
+        self.snapshot = None
+        self._snapshot_max_id = 0
+        if os.path.exists(self.index_path):
+            try:
+                self.snapshot = _read_index_mmap(self.index_path)
+                ids = faiss.vector_to_array(self.snapshot.id_map)
+                self._snapshot_max_id = int(ids.max()) if len(ids) else 0
+            except Exception as e:
+                print(f"[FAISS]  Ignoring unreadable index snapshot: {e}")
+                self.snapshot = None
+        self.delta = _new_index()
+        self._max_seen_id = self._snapshot_max_id
+        self._set_removed(set())
+        self._catch_up()
+        total = (self.snapshot.ntotal if self.snapshot else 0) + self.delta.ntotal
+        print(f"[FAISS]  Warm-loaded {total} cached results")
+
+    def _catch_up(self):
+        """Add rows written since we last looked (by us or another worker)."""
+        rows = self._db.execute(
+            "SELECT id, embedding FROM results WHERE id > ? AND expires_at > ?",
+            (self._max_seen_id, time.time()),
+        ).fetchall()
+        if not rows:
+            return
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        vectors = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+        self.delta.add_with_ids(vectors, ids)
+        self._max_seen_id = int(ids.max())
+
+    # ---------- eviction ----------
+
+    def _set_removed(self, removed: set):
+        # The mapped snapshot can't be modified, so searches exclude these ids
+        self._removed = removed
+        self._search_params = None
+        if removed:
+            # faiss doesn't own these, so keep every layer referenced
+            self._removed_ids = np.array(sorted(removed), dtype=np.int64)
+            self._removed_batch = faiss.IDSelectorBatch(self._removed_ids)
+            self._selector = faiss.IDSelectorNot(self._removed_batch)
+            self._search_params = faiss.SearchParameters(sel=self._selector)
+
+    def _remove_from_index(self, ids: List[int]):
+        if not ids:
+            return
+        self.delta.remove_ids(np.array(ids, dtype=np.int64))
+        in_snapshot = {i for i in ids if i <= self._snapshot_max_id}
+        if self.snapshot is not None and not in_snapshot <= self._removed:
+            self._set_removed(self._removed | in_snapshot)
+
+    def _evict(self, check_size: bool):
+        """
+        Drop expired entries and, if check_size, the least recently used ones
+        until evict_every more inserts fit under max_entries.
+        """
+        now = time.time()
+        ids = [
+            r[0]
+            for r in self._db.execute(
+                "SELECT id FROM results WHERE expires_at <= ?", (now,)
+            )
+        ]
+        if check_size:
+            self._flush_touches()
+            (count,) = self._db.execute("SELECT COUNT(*) FROM results").fetchone()
+            overflow = count - len(ids) - (self.max_entries - self.evict_every)
+            if overflow > 0:
+                ids += [
+                    r[0]
+                    for r in self._db.execute(
+                        "SELECT id FROM results WHERE expires_at > ? "
+                        "ORDER BY last_used LIMIT ?",
+                        (now, overflow),
+                    )
+                ]
+        if not ids:
+            return
+        self._db.executemany("DELETE FROM results WHERE id = ?", [(i,) for i in ids])
+        self._db.commit()
+        self._remove_from_index(ids)
+        self.counters["evictions"] += len(ids)
+        print(f"[FAISS]  Evicted {len(ids)} cached results")
+
+    # ---------- public API ----------
+
+    def add(self, store: str, product: str, result: Dict):
+        key = self.key(store, product)
+        embedding = self._embed(key)
+        with self._lock:
+            # Also clears an expired entry for this key, so the insert can land
+            self._evict(check_size=self._inserts % self.evict_every == 0)
+            self._inserts += 1
+            now = time.time()
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO results "
+                "(key, result, embedding, expires_at, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    json.dumps(result),
+                    embedding.tobytes(),
+                    now + self.ttl_seconds,
+                    now,
+                    now,
+                ),
+            )
+            self._db.commit()
+            if not cur.rowcount:
+                return
+            self._catch_up()
+            if self.delta.ntotal >= SNAPSHOT_EVERY:
+                self.save()
         print(f"[FAISS]  Cached result for: {key}")
 
+    def _touch(self, row_id: int):
+        now = time.time()
+        self._touched[row_id] = now
+        if (
+            len(self._touched) >= TOUCH_FLUSH_EVERY
+            or now - self._touch_flushed_at >= TOUCH_FLUSH_SECONDS
+        ):
+            self._flush_touches()
+
+    def _flush_touches(self):
+        """Write buffered last_used times in one transaction."""
+        self._touch_flushed_at = time.time()
+        if not self._touched:
+            return
+        # MAX keeps a newer time another worker already wrote
+        self._db.executemany(
+            "UPDATE results SET last_used = MAX(last_used, ?) WHERE id = ?",
+            [(used, row_id) for row_id, used in self._touched.items()],
+        )
+        self._db.commit()
+        self._touched = {}
+
     def retrieve_similar(
         self, store: str, product: str, threshold: float = 0.85
     ) -> Optional[Dict]:
-        key = self._id(store, product)
-        if len(self.entries) == 0:
-            return None
-        embedding = (
-            self.model.encode(key, normalize_embeddings=True)
-            .astype(np.float32)
-            .reshape(1, -1)
-        )
-        D, I = self.index.search(embedding, k=1)
-        if D[0][0] < (2 - 2 * threshold):  # cosine distance threshold
-            match_store, match_product = self.entries[str(I[0][0])]
-            match_key = self._id(match_store, match_product)
-            print(f"[FAISS]  Reused from similar: {match_key} (dist={D[0][0]:.4f})")
-            return self.results.get(match_key)
+        key = self.key(store, product)
+        with self._lock:
+            # Exact key: no embedding or index search needed
+            row = self._db.execute(
+                "SELECT id, result FROM results WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+            if row is not None:
+                self._touch(row[0])
+                self.counters["exact_hits"] += 1
+                print(f"[FAISS]  Exact hit: {key}")
+                return json.loads(row[1])
+            self._catch_up()
+            if not self.delta.ntotal and not (self.snapshot and self.snapshot.ntotal):
+                self.counters["misses"] += 1
+                return None
+        embedding = self._embed(key)
+        with self._lock:
+            scores = {}
+            for index, params in (
+                (self.snapshot, self._search_params),
+                (self.delta, None),
+            ):
+                if index is None or not index.ntotal:
+                    continue
+                D, I = index.search(
+                    embedding, k=min(SEARCH_K, index.ntotal), params=params
+                )
+                for score, row_id in zip(D[0], I[0]):
+                    if row_id >= 0 and score > threshold:  # cosine threshold
+                        scores[int(row_id)] = float(score)
+            candidates = sorted(scores, key=scores.get, reverse=True)
+            live = {}
+            if candidates:
+                placeholders = ",".join("?" * len(candidates))
+                live = dict(
+                    self._db.execute(
+                        f"SELECT id, key FROM results WHERE id IN ({placeholders}) "
+                        "AND expires_at > ?",
+                        (*candidates, time.time()),
+                    ).fetchall()
+                )
+                # Evicted or expired elsewhere: stop matching them here too
+                self._remove_from_index([i for i in candidates if i not in live])
+            for row_id in candidates:
+                if row_id not in live:
+                    continue
+                (result,) = self._db.execute(
+                    "SELECT result FROM results WHERE id = ?", (row_id,)
+                ).fetchone()
+                self._touch(row_id)
+                self.counters["similar_hits"] += 1
+                print(
+                    f"[FAISS]  Reused from similar: {live[row_id]} "
+                    f"(sim={scores[row_id]:.4f})"
+                )
+                return json.loads(result)
+            self.counters["misses"] += 1
         return None
 
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters of this process, plus the shared entry count."""
+        with self._lock:
+            (entries,) = self._db.execute(
+                "SELECT COUNT(*) FROM results WHERE expires_at > ?", (time.time(),)
+            ).fetchone()
+            return {**self.counters, "entries": entries}
+
+    def save(self):
+        """
+        Write every live entry to a fresh index snapshot and swap it in
+        atomically, then start a new, empty delta.
+        """
+        with self._lock:
+            self._flush_touches()
+            rows = self._db.execute(
+                "SELECT id, embedding FROM results WHERE expires_at > ?",
+                (time.time(),),
+            ).fetchall()
+            index = _new_index()
+            if rows:
+                index.add_with_ids(
+                    np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows]),
+                    np.array([r[0] for r in rows], dtype=np.int64),
+                )
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            self.snapshot = _read_index_mmap(self.index_path)
+            self.delta = _new_index()
+            self._set_removed(set())
+            self._snapshot_max_id = max([r[0] for r in rows], default=0)
+            self._max_seen_id = self._snapshot_max_id
+            self._catch_up()
+
 
 # === Main Agent ===
+
+# Summarize the candidate pages concurrently instead of one at a time. Off by
+# default: it answers in about one page's time, but pages running when the
+# answer arrives still finish their (billed) LLM calls.
+PARALLEL_PAGES = os.getenv("AVAILABILITY_PARALLEL_PAGES", "0") == "1"
+# Pages fetched and summarized at once in parallel mode
+SUMMARIZE_WORKERS = int(os.getenv("AVAILABILITY_SUMMARIZE_WORKERS", "5"))
+
+
 class ProductAvailabilityAgent:
-    def __init__(self):
+    def __init__(self, parallel_pages: bool = PARALLEL_PAGES):
+        # Summarize candidate pages concurrently, or one by one until a confident yes
+        self.parallel_pages = parallel_pages
         self.find_site_tool = FindStoreWebsiteTool()
         self.extract_pages_tool = ExtractPagesTool()
         self.summarizer_tool = SummarizeStorePageTool()
         self.graph = self._build_graph()
         self.cache = ResultCache()
+        # normalized store|product key → Future of the run serving it
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
 
     def _find_store_website_node(self, state: AgentState) -> AgentState:
         print(f"[Node] Finding website for store: {state['store']}")
@@ -89,6 +426,7 @@ class ProductAvailabilityAgent:
         return {
             "product": state["product"],
             "store": state["store"],
+            "category": state.get("category"),
             "store_url": store_url,
             "page_urls": [],
             "current_index": 0,
@@ -99,8 +437,16 @@ class ProductAvailabilityAgent:
     def _extract_pages_node(self, state: AgentState) -> AgentState:
         print(f"[Node] Extracting internal links for: {state['store_url']}")
         input_str = f"{state['product']}|||{state['store_url']}"
+        if state.get("category"):
+            # Lets the tool reuse pages it picked for this store and category
+            input_str += f"|||{state['category']}"
         raw_links = self.extract_pages_tool.run(input_str)
-        urls = [url.strip() for url in raw_links.splitlines() if url.strip()]
+        # The tool reports failures as "[ERROR] ..." text: keep only URLs
+        urls = [
+            url.strip()
+            for url in raw_links.splitlines()
+            if url.strip().lower().startswith(("http://", "https://"))
+        ]
         print(f"[Node] Found top {len(urls)} links")
         return {
             **state,
@@ -123,6 +469,14 @@ class ProductAvailabilityAgent:
         print(f"[Node]  Summarizing page {index + 1}/{len(urls)}: {current_url}")
         result_str = self.summarizer_tool.run(input_str)
 
+        accepted = self._confident_answer(result_str)
+        if accepted:
+            return {**state, "answer": json.dumps(accepted), "price": accepted["price"]}
+
+        return {**state, "current_index": index + 1}
+
+    def _confident_answer(self, result_str: str) -> Optional[Dict]:
+        """Parse one page summary; returns the final answer if it is a confident yes."""
         try:
             result = json.loads(result_str)
             confidence = float(result.get("confidence", 0))
@@ -131,24 +485,59 @@ class ProductAvailabilityAgent:
             )
 
             if result.get("answer") is True and confidence > 0.7:
-                price = result.get("price", None)
                 return {
-                    **state,
-                    "answer": json.dumps(
-                        {
-                            "answer": True,
-                            "confidence": confidence,
-                            "reason": result.get("reason", ""),
-                            "price": price,
-                        }
-                    ),
-                    "price": price,
+                    "answer": True,
+                    "confidence": confidence,
+                    "reason": result.get("reason", ""),
+                    "price": result.get("price", None),
                 }
 
         except Exception as e:
             print(f"[Node] JSON parse failed: {e}")
 
-        return {**state, "current_index": index + 1}
+        return None
+
+    def _summarize_pages_parallel_node(self, state: AgentState) -> AgentState:
+        """
+        Summarize all page_urls concurrently and take the first confident
+        yes. Pages not yet started are cancelled then; pages already in
+        flight are left to finish in the background, unawaited.
+        """
+        urls = state["page_urls"]
+        done = {**state, "current_index": len(urls)}
+        if not urls:
+            print("[Node] All pages checked, no high confidence found.")
+            return {**done, "answer": "False (No high confidence found in any page)"}
+
+        print(f"[Node]  Summarizing {len(urls)} pages in parallel")
+        pool = ThreadPoolExecutor(
+            max_workers=min(len(urls), SUMMARIZE_WORKERS),
+            thread_name_prefix="summarize",
+        )
+        futures = {
+            pool.submit(self.summarizer_tool.run, f"{state['product']}|||{url}"): url
+            for url in urls
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    result_str = future.result()
+                except Exception as e:
+                    print(f"[ERROR summarize] {futures[future]}: {e}")
+                    continue
+                accepted = self._confident_answer(result_str)
+                if accepted:
+                    print(f"[Node]  Confident answer from: {futures[future]}")
+                    return {
+                        **done,
+                        "answer": json.dumps(accepted),
+                        "price": accepted["price"],
+                    }
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        print("[Node] All pages checked, no high confidence found.")
+        return {**done, "answer": "False (No high confidence found in any page)"}
 
     def _continue_or_stop(self, state: AgentState) -> str:
         if state.get("answer"):
@@ -161,9 +550,15 @@ class ProductAvailabilityAgent:
         builder = StateGraph(AgentState)
         builder.add_node("find_site", self._find_store_website_node)
         builder.add_node("extract_pages", self._extract_pages_node)
-        builder.add_node("summarize_next", self._summarize_page_node)
         builder.set_entry_point("find_site")
         builder.add_edge("find_site", "extract_pages")
+        if self.parallel_pages:
+            builder.add_node("summarize_pages", self._summarize_pages_parallel_node)
+            builder.add_edge("extract_pages", "summarize_pages")
+            builder.add_edge("summarize_pages", END)
+            return builder.compile()
+
+        builder.add_node("summarize_next", self._summarize_page_node)
         builder.add_edge("extract_pages", "summarize_next")
         builder.add_conditional_edges(
             "summarize_next",
@@ -172,13 +567,50 @@ class ProductAvailabilityAgent:
         )
         return builder.compile()
 
-    def check_product(self, product: str, store: str) -> Dict:
+    def check_product(
+        self, product: str, store: str, category: Optional[str] = None
+    ) -> Dict:
+        """
+        `category` (the product's predicted category, supplied by the caller)
+        lets the page-selection step reuse pages picked for other products
+        of that category at this store.
+
+        Concurrent calls for the same normalized (store, product) key share
+        one run: the first caller does the work and the rest wait for its
+        result (or its exception).
+        """
+        key = self.cache.key(store, product)
+        with self._in_flight_lock:
+            pending = self._in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._in_flight[key] = Future()
+        if not leader:
+            print(f"[Agent] Waiting for in-flight check: {key}")
+            return pending.result()
+
+        try:
+            result = self._check_product(product, store, category)
+            pending.set_result(result)
+            return result
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    def _check_product(
+        self, product: str, store: str, category: Optional[str] = None
+    ) -> Dict:
         cached = self.cache.retrieve_similar(store, product)
         if cached:
             return cached
 
         # Run full graph
-        result = self.graph.invoke({"product": product, "store": store})
+        result = self.graph.invoke(
+            {"product": product, "store": store, "category": category}
+        )
 
         # Parse and save result
         try:
@@ -0,0 +1,72 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+# Where the availability agent keeps its on-disk caches
+CACHE_DIR = os.getenv("AVAILABILITY_CACHE_DIR", os.path.join("cache", "availability"))
+
+# How long each kind of per-store answer is trusted
+STORE_URL_TTL_SECONDS = int(os.getenv("STORE_URL_TTL_SECONDS", str(30 * 24 * 3600)))
+STORE_LINKS_TTL_SECONDS = int(os.getenv("STORE_LINKS_TTL_SECONDS", str(24 * 3600)))
+STORE_PAGES_TTL_SECONDS = int(os.getenv("STORE_PAGES_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+class StoreCache:
+    """
+    On-disk key-value store with a TTL per entry, for answers about a store
+    that rarely change: its website, its homepage links and the pages the
+    LLM picked for a product category. Entries are JSON values grouped by
+    namespace, in a SQLite file that every worker process shares.
+
+    Keys are stored as given: callers normalize what is case-insensitive
+    (store names, categories) but not URLs, whose paths are case-sensitive.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, "stores.sqlite"), check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS store_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._db.commit()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM store_cache "
+                "WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        print(f"[STORE CACHE] {namespace} hit: {key}")
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: int):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM store_cache WHERE namespace = ? AND expires_at <= ?",
+                (namespace, now),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO store_cache (namespace, key, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), now + ttl_seconds),
+            )
+            self._db.commit()
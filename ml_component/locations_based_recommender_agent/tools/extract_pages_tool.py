@@ -1,35 +1,66 @@
 # tools/extract_pages_tool.py
+import re
 from langchain_openai import ChatOpenAI
 from ml_component.locations_based_recommender_agent.web_utils.web_utils import (
     fetch_html,
     extract_links_from_html,
 )
 from ml_component.globals import OPENAI_KEY
+from ml_component.locations_based_recommender_agent.store_cache import (
+    StoreCache,
+    STORE_LINKS_TTL_SECONDS,
+    STORE_PAGES_TTL_SECONDS,
+)
+
+
+def _normalize_url(url: str) -> str:
+    """Comparison form of a URL: lowercase scheme and host, no fragment or final /."""
+    url = url.split("#", 1)[0]
+    scheme, sep, rest = url.partition("://")
+    host, slash, path = rest.partition("/")
+    return f"{scheme.lower()}{sep}{host.lower()}{slash}{path}".rstrip("/")
 
 
 class ExtractPagesTool:
     def __init__(self):
         self.llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0, api_key=OPENAI_KEY)
+        self.cache = StoreCache()
 
     def run(self, input_str: str) -> str:
         """
         Given a string in the format 'product|||store_url', fetch internal links from the store website.
         Uses LLM reasoning to select the 3–5 most relevant URLs for product availability checking.
+
+        An optional third field, 'product|||store_url|||category', lets the
+        selected pages be reused for other products of that category.
+        The homepage links are cached per store either way.
         """
         try:
-            product, store_url = input_str.split("|||")
+            product, store_url, *rest = input_str.split("|||")
+            (category,) = rest or [None]
         except ValueError:
             return "[ERROR] Input must be in the format: 'product|||store_url'"
 
-        html = fetch_html(store_url)
-        if not html:
-            return "[ERROR] Failed to fetch HTML content."
-
-        all_links = extract_links_from_html(html, base_url=store_url)
-        unique_links = list(set(all_links))
+        pages_key = f"{store_url}|{category.strip().lower() if category else None}"
+        if category:
+            cached = self.cache.get("store_pages", pages_key)
+            if cached:
+                return "\n".join(cached)
 
+        unique_links = self.cache.get("store_links", store_url)
         if not unique_links:
-            return "[ERROR] No internal links found on the page."
+            html = fetch_html(store_url)
+            if not html:
+                return "[ERROR] Failed to fetch HTML content."
+
+            all_links = extract_links_from_html(html, base_url=store_url)
+            unique_links = list(set(all_links))
+
+            if not unique_links:
+                return "[ERROR] No internal links found on the page."
+            self.cache.set(
+                "store_links", store_url, unique_links, STORE_LINKS_TTL_SECONDS
+            )
 
         sample_links = unique_links[:100]
         prompt = (
@@ -43,6 +74,27 @@ class ExtractPagesTool:
 
         try:
             response = self.llm.invoke(prompt)
-            return response.content.strip()
         except Exception as e:
             return f"[ERROR] LLM failed: {e}"
+
+        # Match the reply against the links we offered, tolerating small
+        # variations (case of the host, trailing slash). Only matched links
+        # go into the per-category cache; if nothing matched, the LLM's URLs
+        # are still worth a try for this product but are not cached.
+        offered = {_normalize_url(link): link for link in sample_links}
+        selected, unverified = [], []
+        for url in re.findall(r"https?://\S+", response.content, re.IGNORECASE):
+            url = url.rstrip(".,;)>\"'")
+            link = offered.get(_normalize_url(url))
+            if link is not None and link not in selected:
+                selected.append(link)
+            elif link is None and url not in unverified:
+                unverified.append(url)
+        if not selected:
+            if not unverified:
+                return "[ERROR] LLM reply contained no URLs."
+            return "\n".join(unverified)
+
+        if category:
+            self.cache.set("store_pages", pages_key, selected, STORE_PAGES_TTL_SECONDS)
+        return "\n".join(selected)
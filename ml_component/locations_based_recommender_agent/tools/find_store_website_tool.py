@@ -1,16 +1,26 @@
 # tools/find_store_website_tool.py
 from langchain_openai import ChatOpenAI
 from ml_component.globals import OPENAI_KEY
+from ml_component.locations_based_recommender_agent.store_cache import (
+    StoreCache,
+    STORE_URL_TTL_SECONDS,
+)
 import re
 
 
 class FindStoreWebsiteTool:
     def __init__(self):
         self.llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0, api_key=OPENAI_KEY)
+        self.cache = StoreCache()
 
     import re
 
     def run(self, store_name: str) -> str:
+        cache_key = store_name.strip().lower()
+        cached = self.cache.get("store_url", cache_key)
+        if cached:
+            return cached
+
         prompt = (
             f"What is the official website of the store '{store_name}'? "
             "Reply only with the URL."
@@ -25,5 +35,6 @@ class FindStoreWebsiteTool:
             url = match.group(0)
             if not url.startswith("http"):
                 url = "https://" + url
+            self.cache.set("store_url", cache_key, url, STORE_URL_TTL_SECONDS)
             return url
         return ""
@@ -0,0 +1,31 @@
+# tests/fakes.py
+"""Deterministic stand-ins for the embedding model and wall clock."""
+
+import hashlib
+import numpy as np
+
+
+class FakeEncoder:
+    """Bag-of-words hashing encoder with the SentenceTransformer encode() shape."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.calls = 0
+
+    def encode(self, text, normalize_embeddings=False, **kwargs):
+        self.calls += 1
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.replace("|", " ").split():
+            digest = int(hashlib.md5(word.encode()).hexdigest(), 16)
+            vector[digest % self.dim] += 1.0
+        return vector / np.linalg.norm(vector)
+
+
+class FakeClock:
+    """Replaces the `time` module inside the code under test."""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
@@ -0,0 +1,232 @@
+# tests/test_availability_agent.py
+# Run from the repo root: python -m pytest ml_component/tests
+
+import sys
+import os
+import json
+import threading
+import time
+import pytest
+
+# ensure the repo root is on PYTHONPATH so ml_component imports resolve
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("SERVICE_ROLE_KEY", "test-key")
+
+agent = pytest.importorskip(
+    "ml_component.locations_based_recommender_agent.product_availability_agent"
+)
+from ml_component.tests.fakes import FakeEncoder
+
+N_CALLERS = 5
+
+
+class FakeFindSiteTool:
+    def run(self, store_name):
+        return f"https://{store_name}.example"
+
+
+class FakeExtractPagesTool:
+    def run(self, input_str):
+        return "\n".join(f"https://store.example/{i}" for i in range(5))
+
+
+class FakeSummarizer:
+    def run(self, input_str):
+        return json.dumps({"answer": False, "confidence": 0.1, "price": None})
+
+
+def page_summary(answer, confidence, price=None):
+    return json.dumps({"answer": answer, "confidence": confidence, "price": price})
+
+
+class PageSummarizer:
+    """
+    Stub summarizer driven per page index: pages[i] is (delay, reply), where
+    the reply is a JSON string, an exception to raise, or a threading.Event
+    to wait on before answering "no".
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.started = []
+
+    def run(self, input_str):
+        url = input_str.split("|||")[1]
+        index = int(url.rsplit("/", 1)[1])
+        self.started.append(index)
+        delay, reply = self.pages.get(index, (0.3, page_summary(False, 0.1)))
+        time.sleep(delay)
+        if isinstance(reply, Exception):
+            raise reply
+        if isinstance(reply, threading.Event):
+            reply.wait(5)
+            return page_summary(False, 0.1)
+        return reply
+
+
+@pytest.fixture
+def make_agent(tmp_path, monkeypatch):
+    encoder = FakeEncoder()
+    result_cache = agent.ResultCache
+    monkeypatch.setattr(agent, "get_sentence_transformer", lambda name: encoder)
+    monkeypatch.setattr(
+        agent, "ResultCache", lambda: result_cache(cache_dir=str(tmp_path))
+    )
+    monkeypatch.setattr(agent, "FindStoreWebsiteTool", FakeFindSiteTool)
+    monkeypatch.setattr(agent, "ExtractPagesTool", FakeExtractPagesTool)
+    monkeypatch.setattr(agent, "SummarizeStorePageTool", FakeSummarizer)
+    return agent.ProductAvailabilityAgent
+
+
+class SlowGraph:
+    """Counts runs; each one takes long enough for every caller to pile up."""
+
+    def __init__(self, error=None):
+        self.runs = 0
+        self.error = error
+
+    def invoke(self, state):
+        self.runs += 1
+        time.sleep(0.3)
+        if self.error:
+            raise self.error
+        answer = {"answer": True, "confidence": 0.9, "reason": "", "price": None}
+        return {**state, "answer": json.dumps(answer)}
+
+
+def call_concurrently(fn, *args):
+    start = threading.Barrier(N_CALLERS)
+    results, errors = [], []
+
+    def caller():
+        start.wait()
+        try:
+            results.append(fn(*args))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(N_CALLERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results, errors
+
+
+# ----- single-flight -----
+
+
+def test_concurrent_checks_share_one_graph_run(make_agent):
+    availability = make_agent()
+    availability.graph = SlowGraph()
+
+    results, errors = call_concurrently(
+        availability.check_product, " Milk", "SHUFERSAL"
+    )
+
+    assert availability.graph.runs == 1
+    assert errors == []
+    assert len(results) == N_CALLERS
+    assert all(r is results[0] for r in results)
+    assert availability._in_flight == {}
+
+
+def test_graph_error_reaches_every_waiter(make_agent):
+    availability = make_agent()
+    failure = RuntimeError("store site down")
+    availability.graph = SlowGraph(error=failure)
+
+    results, errors = call_concurrently(availability.check_product, "milk", "store")
+
+    assert availability.graph.runs == 1
+    assert results == []
+    assert errors == [failure] * N_CALLERS
+    assert availability._in_flight == {}
+
+
+# ----- page summarization -----
+
+
+def test_parallel_first_confident_yes_wins(make_agent):
+    availability = make_agent(parallel_pages=True)
+    availability.summarizer_tool = PageSummarizer(
+        {3: (0.05, page_summary(True, 0.9, "$3"))}
+    )
+
+    start = time.monotonic()
+    result = availability.check_product("milk", "store")
+
+    assert result["answer"] is True
+    assert result["price"] == "$3"
+    # about one page's time, not five
+    assert time.monotonic() - start < 0.25
+
+
+def test_parallel_cancels_pages_not_yet_started(make_agent, monkeypatch):
+    monkeypatch.setattr(agent, "SUMMARIZE_WORKERS", 1)
+    gate = threading.Event()
+    summarizer = PageSummarizer(
+        {0: (0.0, page_summary(True, 0.9))} | {i: (0.0, gate) for i in range(1, 5)}
+    )
+    availability = make_agent(parallel_pages=True)
+    availability.summarizer_tool = summarizer
+
+    assert availability.check_product("milk", "store")["answer"] is True
+    gate.set()
+    time.sleep(0.1)
+
+    # the worker may have picked up page 1 already; the rest never run
+    assert set(summarizer.started) <= {0, 1}
+
+
+def test_parallel_page_error_does_not_stop_the_others(make_agent):
+    availability = make_agent(parallel_pages=True)
+    availability.summarizer_tool = PageSummarizer(
+        {
+            0: (0.0, RuntimeError("404")),
+            1: (0.05, page_summary(True, 0.8, "$1")),
+        }
+    )
+
+    assert availability.check_product("milk", "store")["price"] == "$1"
+
+
+def test_parallel_without_confident_page_answers_no(make_agent):
+    availability = make_agent(parallel_pages=True)
+    availability.summarizer_tool = PageSummarizer(
+        {0: (0.0, RuntimeError("404"))}
+        | {i: (0.0, page_summary(True, 0.5)) for i in range(1, 5)}
+    )
+
+    result = availability.check_product("milk", "store")
+    assert result["answer"] is False
+    assert "No high confidence" in result["reason"]
+
+
+def test_sequential_mode_stops_at_first_confident_page(make_agent):
+    availability = make_agent(parallel_pages=False)
+    summarizer = PageSummarizer(
+        {
+            0: (0.0, page_summary(False, 0.1)),
+            1: (0.0, page_summary(True, 0.5)),
+            2: (0.0, page_summary(True, 0.9, "$2")),
+        }
+    )
+    availability.summarizer_tool = summarizer
+
+    assert availability.check_product("milk", "store")["price"] == "$2"
+    assert summarizer.started == [0, 1, 2]
+
+
+def test_error_text_from_page_extraction_is_not_a_url(make_agent, monkeypatch):
+    class FailingExtractPagesTool:
+        def run(self, input_str):
+            return "[ERROR] Failed to fetch HTML content."
+
+    monkeypatch.setattr(agent, "ExtractPagesTool", FailingExtractPagesTool)
+    state = make_agent()._extract_pages_node(
+        {"product": "milk", "store_url": "https://store.example", "category": None}
+    )
+    assert state["page_urls"] == []
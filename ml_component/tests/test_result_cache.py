@@ -0,0 +1,147 @@
+# tests/test_result_cache.py
+# Run from the repo root: python -m pytest ml_component/tests
+
+import sys
+import os
+import pytest
+
+# ensure the repo root is on PYTHONPATH so ml_component imports resolve
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("SERVICE_ROLE_KEY", "test-key")
+
+agent = pytest.importorskip(
+    "ml_component.locations_based_recommender_agent.product_availability_agent"
+)
+from ml_component.tests.fakes import FakeClock, FakeEncoder
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    encoder = FakeEncoder()
+    monkeypatch.setattr(agent, "get_sentence_transformer", lambda name: encoder)
+    return encoder
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(agent, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_cache(tmp_path, encoder, clock):
+    def make(**kwargs):
+        kwargs.setdefault("ttl_seconds", 3600)
+        kwargs.setdefault("evict_every", 1)
+        return agent.ResultCache(cache_dir=str(tmp_path), **kwargs)
+
+    return make
+
+
+def test_exact_hit_skips_the_model(make_cache, encoder):
+    cache = make_cache()
+    cache.add("Shufersal", "milk", {"answer": True})
+    calls = encoder.calls
+
+    assert cache.retrieve_similar(" shufersal ", "MILK") == {"answer": True}
+    assert encoder.calls == calls
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_similar_key_is_reused(make_cache):
+    cache = make_cache()
+    cache.add("shufersal", "milk", {"answer": True})
+
+    assert cache.retrieve_similar("shufersal", "milk milk") == {"answer": True}
+    assert cache.retrieve_similar("rami levy", "bread") is None
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_entries_expire_after_ttl(make_cache, clock):
+    cache = make_cache(ttl_seconds=60)
+    cache.add("shufersal", "milk", {"answer": True})
+
+    clock.now += 61
+    assert cache.retrieve_similar("shufersal", "milk") is None
+    assert cache.retrieve_similar("shufersal", "milk milk") is None
+
+    # an expired key can be cached again
+    cache.add("shufersal", "milk", {"answer": False})
+    assert cache.retrieve_similar("shufersal", "milk") == {"answer": False}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(make_cache, clock):
+    cache = make_cache(max_entries=2)
+    cache.add("shufersal", "milk", {"p": "milk"})
+    clock.now += 1
+    cache.add("shufersal", "bread", {"p": "bread"})
+    clock.now += 1
+    cache.retrieve_similar("shufersal", "milk")  # bread is now least recent
+    clock.now += 1
+    cache.add("shufersal", "eggs", {"p": "eggs"})
+
+    assert cache.stats()["entries"] == 2
+    assert cache.retrieve_similar("shufersal", "bread") is None
+    assert cache.retrieve_similar("shufersal", "milk") == {"p": "milk"}
+    assert cache.retrieve_similar("shufersal", "eggs") == {"p": "eggs"}
+
+
+def test_entry_evicted_by_another_worker_is_not_matched(make_cache, clock):
+    writer = make_cache(max_entries=2)
+    writer.add("shufersal", "milk", {"p": "milk"})
+    clock.now += 1
+    writer.add("shufersal", "bread", {"p": "bread"})
+    writer.save()
+
+    # this worker maps the snapshot holding both entries
+    reader = make_cache(max_entries=2)
+    assert reader.snapshot.ntotal == 2
+
+    clock.now += 1
+    writer.add("shufersal", "eggs", {"p": "eggs"})  # evicts milk
+
+    assert reader.retrieve_similar("shufersal", "milk milk") is None
+    # from now on the snapshot search excludes it outright
+    (milk_id,) = reader._removed
+    assert milk_id <= reader._snapshot_max_id
+    assert reader.retrieve_similar("shufersal", "bread") == {"p": "bread"}
+
+
+def test_counters(make_cache):
+    cache = make_cache()
+    cache.add("shufersal", "milk", {"answer": True})
+    cache.retrieve_similar("shufersal", "milk")
+    cache.retrieve_similar("shufersal", "milk milk")
+    cache.retrieve_similar("rami levy", "bread")
+
+    assert cache.stats() == {
+        "exact_hits": 1,
+        "similar_hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "entries": 1,
+    }
+
+
+def test_hits_buffer_last_used_until_eviction(make_cache, clock):
+    cache = make_cache(max_entries=10, evict_every=2)
+    cache.add("shufersal", "milk", {"p": "milk"})
+    clock.now += 1
+
+    def last_used():
+        return cache._db.execute(
+            "SELECT last_used FROM results WHERE key = ?", ("shufersal|milk",)
+        ).fetchone()[0]
+
+    before = last_used()
+    cache.retrieve_similar("shufersal", "milk")
+    assert last_used() == before  # the hit did not write
+
+    cache.add("shufersal", "bread", {"p": "bread"})  # no size check yet
+    assert last_used() == before
+    cache.add("shufersal", "eggs", {"p": "eggs"})  # size check flushes first
+    assert last_used() == clock.now
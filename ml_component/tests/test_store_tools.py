@@ -0,0 +1,108 @@
+# tests/test_store_tools.py
+# Run from the repo root: python -m pytest ml_component/tests
+
+import sys
+import os
+import types
+import pytest
+
+# ensure the repo root is on PYTHONPATH so ml_component imports resolve
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("SERVICE_ROLE_KEY", "test-key")
+
+extract_pages = pytest.importorskip(
+    "ml_component.locations_based_recommender_agent.tools.extract_pages_tool"
+)
+from ml_component.locations_based_recommender_agent.store_cache import StoreCache
+
+STORE_URL = "https://store.example"
+LINKS = [f"{STORE_URL}/dairy", f"{STORE_URL}/bakery", f"{STORE_URL}/about"]
+
+
+class FakeLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return types.SimpleNamespace(content=self.reply)
+
+
+@pytest.fixture
+def make_tool(tmp_path, monkeypatch):
+    fetches = []
+    monkeypatch.setattr(
+        extract_pages, "fetch_html", lambda url: fetches.append(url) or "<html>"
+    )
+    monkeypatch.setattr(
+        extract_pages, "extract_links_from_html", lambda html, base_url: LINKS
+    )
+
+    def make(reply):
+        llm = FakeLLM(reply)
+        monkeypatch.setattr(extract_pages, "ChatOpenAI", lambda **kwargs: llm)
+        monkeypatch.setattr(
+            extract_pages, "StoreCache", lambda: StoreCache(cache_dir=str(tmp_path))
+        )
+        tool = extract_pages.ExtractPagesTool()
+        tool.fetches = fetches
+        return tool
+
+    return make
+
+
+def test_only_offered_links_are_kept_and_cached(make_tool):
+    tool = make_tool(
+        "Sure! The best pages are:\n"
+        f"1. {STORE_URL}/dairy.\n"
+        "https://elsewhere.example/milk\n"
+        f"{STORE_URL}/dairy\n"
+        f"- {STORE_URL}/bakery"
+    )
+
+    out = tool.run(f"milk|||{STORE_URL}|||Dairy")
+    assert out.splitlines() == [f"{STORE_URL}/dairy", f"{STORE_URL}/bakery"]
+
+    # another product of the same category reuses the pages without the LLM
+    assert tool.run(f"cheese|||{STORE_URL}|||dairy") == out
+    assert tool.llm.calls == 1
+    assert len(tool.fetches) == 1
+
+
+def test_url_variants_match_the_offered_link(make_tool):
+    tool = make_tool(f"HTTPS://STORE.example/dairy/\n{STORE_URL}/Bakery")
+
+    out = tool.run(f"milk|||{STORE_URL}|||Dairy")
+    # the path is case-sensitive, so /Bakery is not /bakery
+    assert out.splitlines() == [f"{STORE_URL}/dairy"]
+    assert tool.cache.get("store_pages", f"{STORE_URL}|dairy") == [f"{STORE_URL}/dairy"]
+
+
+def test_unmatched_links_are_tried_but_not_cached(make_tool):
+    tool = make_tool("https://elsewhere.example/milk")
+
+    assert tool.run(f"milk|||{STORE_URL}|||Dairy") == "https://elsewhere.example/milk"
+    assert tool.cache.get("store_pages", f"{STORE_URL}|dairy") is None
+
+
+def test_reply_without_offered_links_is_not_cached(make_tool):
+    tool = make_tool("I could not find anything relevant, sorry.")
+
+    assert tool.run(f"milk|||{STORE_URL}|||Dairy").startswith("[ERROR]")
+    assert tool.cache.get("store_pages", f"{STORE_URL}|dairy") is None
+    # the homepage links are still cached
+    tool.run(f"milk|||{STORE_URL}|||Dairy")
+    assert tool.llm.calls == 2
+    assert len(tool.fetches) == 1
+
+
+def test_store_cache_keeps_key_case(tmp_path):
+    cache = StoreCache(cache_dir=str(tmp_path))
+    cache.set("store_links", f"{STORE_URL}/A", ["a"], 60)
+    cache.set("store_links", f"{STORE_URL}/a", ["b"], 60)
+
+    assert cache.get("store_links", f"{STORE_URL}/A") == ["a"]
+    assert cache.get("store_links", f"{STORE_URL}/a") == ["b"]